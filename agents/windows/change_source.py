@@ -0,0 +1,249 @@
+# change_source.py
+
+import os
+import time
+import hashlib
+import logging
+import threading
+
+
+class ChangeQueue:
+    """
+    Changed paths reported by a change source. A path is released once it
+    has been quiet for `debounce` seconds, so a file being written is
+    scanned once after the last write. When more than `max_pending` paths
+    are waiting, new ones are dropped and `overflowed` is set so the caller
+    falls back to a full reconciliation walk.
+    """
+
+    def __init__(self, debounce=5.0, max_pending=100000):
+        self.debounce = debounce
+        self.max_pending = max_pending
+        self.overflowed = False
+        self._pending = {}  # path -> time of last event
+        self._cond = threading.Condition()
+
+    def put(self, path: str):
+        with self._cond:
+            if path not in self._pending and len(self._pending) >= self.max_pending:
+                self.overflowed = True
+                return
+            self._pending[path] = time.monotonic()
+            self._cond.notify()
+
+    def mark_overflow(self):
+        with self._cond:
+            self.overflowed = True
+            self._cond.notify()
+
+    def get_batch(self, timeout=None):
+        """
+        Wait until some paths have been quiet for the debounce period (or
+        the queue overflowed) and return them; [] on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [
+                    path
+                    for path, seen in self._pending.items()
+                    if now - seen >= self.debounce
+                ]
+                if ready:
+                    for path in ready:
+                        del self._pending[path]
+                    return ready
+                if self.overflowed:
+                    return []
+
+                wait = None
+                if self._pending:
+                    wait = self.debounce - (now - min(self._pending.values()))
+                if deadline is not None:
+                    if now >= deadline:
+                        return []
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._cond.wait(wait)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+
+class PollingChangeSource:
+    """
+    Portable change source: polls the mtime of every (non-excluded)
+    directory and reports the directories whose mtime moved, plus new
+    subdirectories; the caller re-lists them. This sees files being
+    created, deleted, renamed or saved by replace; in-place edits are left
+    to the periodic reconciliation walk. Per directory only the mtime and a
+    digest of the entry names are kept.
+    """
+
+    name = "polling"
+
+    def __init__(self, base_dirs, excluded, queue, interval=60):
+        self.base_dirs = base_dirs
+        self.excluded = excluded
+        self.queue = queue
+        self.interval = interval
+        self._dirs = {}  # dir -> (mtime_ns, digest of entry names)
+
+    def start(self):
+        # The first walk over every drive runs on the polling thread
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _list(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return None
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False) and not (
+                    self.excluded.match_name(entry.name)
+                    or self.excluded.match_path(entry.path)
+                ):
+                    subdirs.append(entry.path)
+            except OSError:
+                continue
+        digest = hashlib.blake2b(
+            "\0".join(sorted(entry.name for entry in entries)).encode(
+                "utf-8", errors="replace"
+            ),
+            digest_size=8,
+        ).digest()
+        return mtime, digest, subdirs
+
+    def _track_tree(self, path):
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            listing = self._list(current)
+            if listing is None:
+                continue
+            mtime, digest, subdirs = listing
+            self._dirs[current] = (mtime, digest)
+            stack.extend(subdirs)
+
+    def _run(self):
+        for base_dir in self.base_dirs:
+            if not self.excluded(base_dir):
+                self._track_tree(base_dir)
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                logging.error(f"Change polling error: {e}")
+
+    def poll(self):
+        for path, (mtime, digest) in list(self._dirs.items()):
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                # Directory removed: forget it and everything below it
+                prefix = path.rstrip("\\/") + os.sep
+                for tracked in [d for d in self._dirs if d.startswith(prefix)]:
+                    del self._dirs[tracked]
+                self._dirs.pop(path, None)
+                self.queue.put(path)
+                continue
+            if current == mtime:
+                continue
+
+            listing = self._list(path)
+            if listing is None:
+                continue
+            new_mtime, new_digest, subdirs = listing
+            self._dirs[path] = (new_mtime, new_digest)
+            # Files may have been added, removed or replaced
+            self.queue.put(path)
+            if new_digest != digest:
+                for subdir in subdirs:
+                    if subdir not in self._dirs:
+                        self._track_tree(subdir)
+                        self.queue.put(subdir)
+
+
+class WindowsChangeSource:
+    """Change notifications from ReadDirectoryChangesW, one watcher thread per drive."""
+
+    name = "windows"
+
+    def __init__(self, base_dirs, excluded, queue, buffer_bytes=64 * 1024):
+        import win32con
+        import win32file
+
+        self.win32con = win32con
+        self.win32file = win32file
+        self.base_dirs = base_dirs
+        self.excluded = excluded
+        self.queue = queue
+        self.buffer_bytes = buffer_bytes
+
+    def start(self):
+        for base_dir in self.base_dirs:
+            if not self.excluded(base_dir):
+                threading.Thread(
+                    target=self._watch, args=(base_dir,), daemon=True
+                ).start()
+
+    def _watch(self, base_dir):
+        win32con, win32file = self.win32con, self.win32file
+        flags = (
+            win32con.FILE_NOTIFY_CHANGE_FILE_NAME
+            | win32con.FILE_NOTIFY_CHANGE_DIR_NAME
+            | win32con.FILE_NOTIFY_CHANGE_SIZE
+            | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE
+        )
+        try:
+            handle = win32file.CreateFile(
+                base_dir,
+                0x0001,  # FILE_LIST_DIRECTORY
+                win32con.FILE_SHARE_READ
+                | win32con.FILE_SHARE_WRITE
+                | win32con.FILE_SHARE_DELETE,
+                None,
+                win32con.OPEN_EXISTING,
+                win32con.FILE_FLAG_BACKUP_SEMANTICS,
+                None,
+            )
+        except Exception as e:
+            logging.error(f"Cannot watch {base_dir}: {e}")
+            self.queue.mark_overflow()
+            return
+
+        while True:
+            try:
+                results = win32file.ReadDirectoryChangesW(
+                    handle, self.buffer_bytes, True, flags, None, None
+                )
+            except Exception as e:
+                logging.error(f"Change notification error on {base_dir}: {e}")
+                self.queue.mark_overflow()
+                return
+            if not results:
+                # Notification buffer overflowed; events were lost
+                self.queue.mark_overflow()
+                continue
+            for _action, name in results:
+                path = os.path.join(base_dir, name)
+                if not self.excluded(path):
+                    self.queue.put(path)
+
+
+def create_change_source(backend, base_dirs, excluded, queue, poll_interval=60):
+    """Return a change source for the configured backend, or None if disabled."""
+    if backend == "none":
+        return None
+    if backend in ("auto", "windows") and os.name == "nt":
+        try:
+            return WindowsChangeSource(base_dirs, excluded, queue)
+        except ImportError as e:
+            logging.error(f"Windows change notifications unavailable: {e}")
+    return PollingChangeSource(base_dirs, excluded, queue, poll_interval)
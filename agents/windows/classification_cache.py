@@ -0,0 +1,147 @@
+# classification_cache.py
+
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+WHITESPACE = re.compile(r"\s+")
+# "FILE: <name> (<EXT>) | " header the agent puts in front of file snippets;
+# Windows file names can't contain "|"
+FILE_HEADER = re.compile(r"^FILE: [^|\n]* \| ")
+
+
+def snippet_key(namespace: str, text: str):
+    """
+    Cache key: model namespace plus a hash of the normalized snippet. The
+    file name header is left out, so copies of the same content under other
+    names share one entry.
+    """
+    normalized = FILE_HEADER.sub("", text or "")
+    normalized = WHITESPACE.sub(" ", normalized).strip().casefold()
+    digest = hashlib.blake2b(
+        normalized.encode("utf-8", errors="replace"), digest_size=16
+    ).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class ClassificationCache:
+    """
+    Classification results by (model namespace, normalized snippet).
+
+    Recent results live in an in-memory LRU of `memory_entries`; all of
+    them are also kept in a local SQLite file so repeated content is not
+    reclassified after a restart. Entries expire after `ttl` seconds and
+    the file is trimmed to the newest `max_entries` rows. The namespace
+    should name the model and its version, so a new model or prompt
+    starts from an empty cache.
+    """
+
+    def __init__(self, path, memory_entries=10000, max_entries=200000, ttl=7 * 86400):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> (stored_at, result)
+        self._con = None
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0}
+
+    def _connect(self):
+        if self._con is None:
+            con = sqlite3.connect(self.path, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS classifications (
+                    key TEXT PRIMARY KEY,
+                    result TEXT,
+                    stored_at REAL
+                )
+            """
+            )
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS idx_stored_at ON classifications(stored_at)"
+            )
+            con.commit()
+            self._con = con
+        return self._con
+
+    def _remember(self, key, stored_at, result):
+        self._memory[key] = (stored_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, namespace: str, text: str):
+        """Return the cached result for this snippet, or None."""
+        key = snippet_key(namespace, text)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return dict(entry[1])
+
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT result, stored_at FROM classifications WHERE key=?", (key,)
+                )
+                .fetchone()
+            )
+            if row and now - row[1] < self.ttl:
+                result = json.loads(row[0])
+                self._remember(key, row[1], result)
+                self.stats["disk_hits"] += 1
+                return dict(result)
+
+            if entry or row:
+                self.stats["expired"] += 1
+                self._memory.pop(key, None)
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, namespace: str, text: str, result):
+        key = snippet_key(namespace, text)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, dict(result))
+            con = self._connect()
+            con.execute(
+                "INSERT OR REPLACE INTO classifications (key, result, stored_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(result), now),
+            )
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                self._prune(con, now)
+            con.commit()
+
+    def _prune(self, con, now):
+        con.execute("DELETE FROM classifications WHERE stored_at < ?", (now - self.ttl,))
+        con.execute(
+            """
+            DELETE FROM classifications WHERE stored_at < (
+                SELECT stored_at FROM classifications
+                ORDER BY stored_at DESC LIMIT 1 OFFSET ?
+            )
+        """,
+            (self.max_entries - 1,),
+        )
+
+    def summary(self):
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return dict(
+                self.stats,
+                memory_entries=len(self._memory),
+                hit_rate=round(hits / lookups, 3) if lookups else 0.0,
+            )
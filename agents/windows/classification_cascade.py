@@ -0,0 +1,91 @@
+# classification_cascade.py
+
+import bisect
+import threading
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is overflow
+        self.total_ms = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000.0
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.total_ms += ms
+
+    def summary(self):
+        count = sum(self.counts)
+        labels = [f"<={b}ms" for b in self.buckets] + [f">{self.buckets[-1]}ms"]
+        return {
+            "count": count,
+            "avg_ms": round(self.total_ms / count, 2) if count else 0.0,
+            "buckets": {l: n for l, n in zip(labels, self.counts) if n},
+        }
+
+
+class ClassificationCascade:
+    """
+    Decides which tier settles a finding's label:
+
+    1. rules   - detector hits that fix the label on their own (a private
+                 key is Confidential whatever a model says)
+    2. sklearn - the local model, when its probability is outside the
+                 uncertain band
+    3. llm     - everything else
+
+    Counts findings per deciding tier and keeps a latency histogram per
+    tier.
+    """
+
+    TIERS = ("rules", "sklearn", "llm")
+
+    def __init__(self, rules, uncertain_band=(0.0, 0.6)):
+        # First matching rule wins, so list the most severe first
+        self.rules = [
+            (
+                set(rule["patterns"]),
+                {"label": rule["label"], "confidence": rule["confidence"]},
+            )
+            for rule in rules
+        ]
+        self.uncertain_low, self.uncertain_high = uncertain_band
+        self._lock = threading.Lock()
+        self.decided = {tier: 0 for tier in self.TIERS}
+        self.latency = {tier: LatencyHistogram() for tier in self.TIERS}
+
+    def rule_result(self, hits):
+        """Label fixed by the detector hits, or None."""
+        matched = {name for name, found in (hits or {}).items() if found}
+        for patterns, result in self.rules:
+            if matched & patterns:
+                return dict(result, tier="rules")
+        return None
+
+    def is_uncertain(self, sklearn_result):
+        """True if the sklearn probability is in the band sent to the LLM."""
+        probability = sklearn_result.get("probability")
+        if probability is None or sklearn_result.get("label") == "N/A":
+            return True
+        return self.uncertain_low <= probability < self.uncertain_high
+
+    def record_decision(self, tier):
+        with self._lock:
+            self.decided[tier] += 1
+
+    def observe(self, tier, seconds):
+        with self._lock:
+            self.latency[tier].observe(seconds)
+
+    def summary(self):
+        with self._lock:
+            total = sum(self.decided.values())
+            return {
+                "decided": dict(self.decided),
+                "llm_share": round(self.decided["llm"] / total, 3) if total else 0.0,
+                "latency": {t: h.summary() for t, h in self.latency.items()},
+            }
@@ -0,0 +1,138 @@
+# classification_pipeline.py
+
+import time
+import queue
+import random
+import logging
+import threading
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most `per_minute` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, deadline=None):
+        """Block until the next call may start; False if that is past deadline."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            if deadline is not None and start > deadline:
+                return False
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+        return True
+
+
+class ClassificationPipeline:
+    """
+    Runs a slow classifier (the LLM) off the detection threads.
+
+    submit() queues a text with a callback and returns at once. `workers`
+    threads take items in order, wait for the rate limiter, and call
+    `classify`, retrying failures with exponential backoff. Each item has
+    `budget` seconds from submission; once that is spent it is given up
+    and the callback gets None.
+    """
+
+    def __init__(
+        self,
+        classify,
+        workers=4,
+        requests_per_minute=60,
+        max_retries=3,
+        budget=120.0,
+        max_pending=10000,
+    ):
+        self.classify = classify
+        self.workers = workers
+        self.max_retries = max_retries
+        self.budget = budget
+        self.limiter = RateLimiter(requests_per_minute)
+        self._queue = queue.Queue(max_pending)
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "timed_out": 0,
+            "dropped": 0,
+        }
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def start(self):
+        with self._start_lock:
+            if not self._started:
+                self._started = True
+                for _ in range(self.workers):
+                    threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, text, callback):
+        """
+        Queue text for classification. Returns the deadline (time.time())
+        by which callback will have been called, or None if the queue is
+        full and the item was dropped.
+        """
+        self.start()
+        deadline = time.time() + self.budget
+        try:
+            self._queue.put_nowait((text, callback, deadline))
+        except queue.Full:
+            self._count("dropped")
+            return None
+        self._count("submitted")
+        return deadline
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            text, callback, deadline = self._queue.get()
+            try:
+                result = self._classify(text, deadline)
+            except Exception as e:
+                logging.error(f"Classification pipeline error: {e}")
+                result = None
+            try:
+                callback(result)
+            except Exception as e:
+                logging.error(f"Classification callback error: {e}")
+
+    def _classify(self, text, deadline):
+        # The limiter works on the monotonic clock, deadlines on wall time
+        monotonic_deadline = time.monotonic() + (deadline - time.time())
+        for attempt in range(self.max_retries + 1):
+            if not self.limiter.wait(monotonic_deadline):
+                self._count("timed_out")
+                return None
+            try:
+                result = self.classify(text)
+                self._count("completed")
+                return result
+            except Exception as e:
+                logging.warning(f"Classification attempt {attempt + 1} failed: {e}")
+                if attempt == self.max_retries:
+                    break
+                self._count("retries")
+                delay = min(2**attempt, 30) * (0.5 + random.random())
+                if time.time() + delay > deadline:
+                    self._count("timed_out")
+                    return None
+                time.sleep(delay)
+        self._count("failed")
+        return None
+
+    def summary(self):
+        with self._stats_lock:
+            return dict(self.stats, pending=self.pending())
@@ -22,8 +22,89 @@ CONFIG = {
     ],
     "server_url": f"{SERVER_URL}/api/report",
     "sync_url": f"{SERVER_URL}/api/sync_files",
-    "ai_classification": {"enabled": True, "model": "gpt-4o-mini"},
-    "sklearn_classification": {"enabled": True, "model_path": "dlp_model.pkl"},
+    "inventory_url": f"{SERVER_URL}/api/inventory",
+    "inventory_page_size": 5000,
+    "ai_classification": {
+        "enabled": True,
+        "model": "gpt-4o-mini",
+        "request_timeout": 20,  # seconds per API call
+        # LLM calls run in background workers; findings are held for upload
+        # until classified or until the budget is spent
+        "async": True,
+        "workers": 4,
+        "requests_per_minute": 60,
+        "max_retries": 3,
+        "budget_seconds": 120,
+        "max_pending": 10000,
+    },
+    # The model is a NumPy artifact (see model_artifact.py); a pickled
+    # pipeline from older releases is converted on first start
+    "sklearn_classification": {
+        "enabled": True,
+        "model_path": "dlp_model.npz",
+        "legacy_model_path": "dlp_model.pkl",
+    },
+    # Text files are streamed in blocks so memory stays bounded on huge files
+    "text_scan": {
+        "block_bytes": 1024 * 1024,
+        "max_bytes_per_file": 256 * 1024 * 1024,  # None to scan whole files
+        "overlap_chars": 4096,  # only used when a single line spans blocks
+    },
+    # File parsing and detection run in a pool of worker processes
+    "parallel_scan": {
+        "enabled": True,
+        "workers": None,  # None = CPU count - 1
+        "priority": "below_normal",  # normal, below_normal or idle
+        "chunksize": 8,
+    },
+    "change_source": {
+        "backend": "auto",  # auto, windows, polling or none (periodic walks only)
+        "debounce_seconds": 5,
+        "poll_interval": 60,  # polling backend only
+        "max_pending": 100000,  # beyond this, fall back to a full walk
+        "reconcile_interval": 6 * 3600,  # full walk + server sync
+    },
+    "scan_state": {
+        "path": "scan_state.db",  # local SQLite file, survives restarts
+        "commit_every": 200,  # scan results per transaction
+    },
+    # Tiered classification: detector rules, then sklearn, and only findings
+    # sklearn is unsure about go to the LLM
+    "classification_cascade": {
+        "enabled": True,
+        # First matching rule sets the label; most severe first
+        "rules": [
+            {
+                "label": "Confidential",
+                "confidence": 0.95,
+                "patterns": [
+                    "private_key",
+                    "aws_secret",
+                    "openai_api_key",
+                    "gemini_api_key",
+                    "deepseek_api_key",
+                    "database_password",
+                    "database_connection",
+                ],
+            },
+            {
+                "label": "Sensitive",
+                "confidence": 0.70,
+                "patterns": ["credit_card_strict"],
+            },
+        ],
+        # sklearn top-class probabilities in [low, high) escalate to the LLM
+        "uncertain_band": [0.0, 0.6],
+    },
+    # AI/sklearn results by normalized snippet, so repeated content is not
+    # sent to the model again
+    "classification_cache": {
+        "enabled": True,
+        "path": "classification_cache.db",
+        "memory_entries": 10000,  # in-memory LRU size
+        "max_entries": 200000,  # rows kept on disk
+        "ttl_seconds": 7 * 24 * 3600,
+    },
     "patterns": {
         # Enhanced API Keys
         "openai_api_key": r"sk-[A-Za-z0-9_-]{48,}",
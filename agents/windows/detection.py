@@ -0,0 +1,462 @@
+# detection.py
+
+import re
+from bisect import bisect_right
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+LITERAL = sre_parse.LITERAL
+SUBPATTERN = sre_parse.SUBPATTERN
+BRANCH = sre_parse.BRANCH
+AT = sre_parse.AT
+IN = sre_parse.IN
+RANGE = sre_parse.RANGE
+CATEGORY = sre_parse.CATEGORY
+CATEGORY_DIGIT = sre_parse.CATEGORY_DIGIT
+NOT_LITERAL = sre_parse.NOT_LITERAL
+NEGATE = sre_parse.NEGATE
+ANY = sre_parse.ANY
+ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+REPEATS = tuple(
+    getattr(sre_parse, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_parse, name)
+)
+SRE_FLAG_DOTALL = sre_parse.SRE_FLAG_DOTALL
+
+# Zero-width assertions that behave the same at a line break inside a buffer
+# as at the start/end of a single line ('\n' is a non-word character).
+LINE_SAFE_AT = (sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY)
+NEWLINE_CATEGORIES = (
+    sre_parse.CATEGORY_SPACE,
+    sre_parse.CATEGORY_NOT_DIGIT,
+    sre_parse.CATEGORY_NOT_WORD,
+)
+
+# Single-character anchors would fire on almost every line and make the
+# prefilter useless, so such patterns are always run instead.
+MIN_ANCHOR_LEN = 2
+MAX_ALTERNATIVES = 64
+
+# Above this size it is cheaper to test each anchor with a substring search
+# than to run the merged anchor scanner position by position.
+ANCHOR_SEARCH_THRESHOLD = 4096
+
+DIGIT = re.compile(r"\d")
+DIGIT_LINE = re.compile(r"\d[^\n]*")
+NEWLINE = re.compile(r"\n")
+
+
+def _build_fold_table():
+    """Map non-ASCII characters that IGNORECASE treats as ASCII letters (e.g. 'ı', 'ſ')."""
+    table = {}
+    for cp in range(0x80, 0x10000):
+        for cased in (chr(cp).lower(), chr(cp).upper()):
+            if len(cased) == 1 and cased.isascii() and cased.isalpha():
+                table[cp] = cased.lower()
+                break
+    table[0x130] = "i"  # 'İ' lowercases to two characters
+    return table
+
+
+FOLD_TABLE = _build_fold_table()
+
+
+def fold_case(text: str) -> str:
+    """Lowercase text so that case-insensitive literals can be found with plain search."""
+    if not text.isascii():
+        text = text.translate(FOLD_TABLE)
+    return text.lower()
+
+
+def _best(factors):
+    """Pick the most selective literal set (longest shortest member) from factors."""
+    best, best_len = None, 0
+    for factor in factors:
+        if not factor or len(factor) > MAX_ALTERNATIVES:
+            continue
+        shortest = min(len(s) for s in factor)
+        if shortest >= MIN_ANCHOR_LEN and shortest > best_len:
+            best, best_len = factor, shortest
+    return best
+
+
+def _analyse(items):
+    """
+    Return (prefixes, complete, factors) for a parsed regex sequence.
+
+    Every match starts with one of `prefixes` (which describe the whole match
+    when `complete` is True) and contains at least one string from each set
+    in `factors`.
+    """
+    factors = []
+    prefixes = None
+    run = {""}
+    for op, av in items:
+        if op is AT:
+            continue
+        if op is LITERAL:
+            run = {r + chr(av) for r in run}
+            continue
+
+        if op is SUBPATTERN:
+            sub, complete, sub_factors = _analyse(av[-1])
+        elif op is BRANCH:
+            branches = [_analyse(b) for b in av[1]]
+            sub = set().union(*(b[0] for b in branches))
+            complete = all(b[1] for b in branches)
+            # Something is required overall only if every branch requires it.
+            bests = [_best(b[2] + [b[0]]) for b in branches]
+            sub_factors = [set().union(*bests)] if all(bests) else []
+        elif op in REPEATS and av[0] >= 1:
+            sub, _, sub_factors = _analyse(av[2])
+            complete = False
+        else:
+            sub, complete, sub_factors = {""}, False, []
+
+        run = {r + s for r in run for s in sub}
+        factors.extend(sub_factors)
+        if not complete or len(run) > MAX_ALTERNATIVES:
+            factors.append(run)
+            if prefixes is None:
+                prefixes = run
+            run = {""}
+
+    factors.append(run)
+    if prefixes is None:
+        return run, True, factors
+    return prefixes, False, factors
+
+
+def _is_digit_item(op, av):
+    if op is CATEGORY:
+        return av is CATEGORY_DIGIT
+    if op is RANGE:
+        return 48 <= av[0] and av[1] <= 57
+    if op is LITERAL:
+        return chr(av).isdecimal()
+    return False
+
+
+def _requires_digit(items):
+    """Return True if every match of a parsed regex sequence contains a decimal digit."""
+    for op, av in items:
+        if op is IN and av and all(_is_digit_item(*x) for x in av):
+            return True
+        if op is LITERAL and chr(av).isdecimal():
+            return True
+        if op is SUBPATTERN and _requires_digit(av[-1]):
+            return True
+        if op is BRANCH and all(_requires_digit(b) for b in av[1]):
+            return True
+        if op in REPEATS and av[0] >= 1 and _requires_digit(av[2]):
+            return True
+    return False
+
+
+def _in_matches_newline(items):
+    negate, contains = False, False
+    for op, av in items:
+        if op is NEGATE:
+            negate = True
+        elif op is LITERAL:
+            contains |= av == 10
+        elif op is RANGE:
+            contains |= av[0] <= 10 <= av[1]
+        elif op is CATEGORY:
+            contains |= av in NEWLINE_CATEGORIES
+    return contains != negate
+
+
+def _can_cross_lines(items, dotall):
+    """Return True if a match of a parsed regex sequence may differ across a line break."""
+    for op, av in items:
+        if op is LITERAL:
+            if av == 10:
+                return True
+        elif op is NOT_LITERAL:
+            if av != 10:
+                return True
+        elif op is ANY:
+            if dotall:
+                return True
+        elif op is IN:
+            if _in_matches_newline(av):
+                return True
+        elif op is AT:
+            if av not in LINE_SAFE_AT:
+                return True
+        elif op is SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            sub_dotall = (dotall or add_flags & SRE_FLAG_DOTALL) and not (
+                del_flags & SRE_FLAG_DOTALL
+            )
+            if _can_cross_lines(sub, sub_dotall):
+                return True
+        elif op is BRANCH:
+            if any(_can_cross_lines(b, dotall) for b in av[1]):
+                return True
+        elif op in REPEATS:
+            if _can_cross_lines(av[2], dotall):
+                return True
+        elif op is ATOMIC_GROUP:
+            if _can_cross_lines(av, dotall):
+                return True
+        else:
+            # Lookarounds, backreferences and conditionals.
+            return True
+    return False
+
+
+def required_literals(source: str, flags=0):
+    """
+    Return a set of folded literals one of which every match of the pattern
+    contains, or None if the pattern has no usable anchor.
+    """
+    try:
+        _, _, factors = _analyse(sre_parse.parse(source, flags))
+    except Exception:
+        return None
+    return _best([{fold_case(s) for s in f} for f in factors])
+
+
+def requires_digit(source: str, flags=0) -> bool:
+    try:
+        return _requires_digit(sre_parse.parse(source, flags))
+    except Exception:
+        return False
+
+
+def line_safe(source: str, flags=0) -> bool:
+    """
+    Return True if the pattern can never match across a line break, so that
+    matches found in a whole buffer are exactly the per-line matches.
+    """
+    try:
+        parsed = sre_parse.parse(source, flags)
+        if parsed.getwidth()[0] == 0:
+            return False  # empty matches at line ends are counted per line
+        return not _can_cross_lines(parsed, parsed.state.flags & SRE_FLAG_DOTALL)
+    except Exception:
+        return False
+
+
+def _findall_value(m):
+    """Return what pattern.findall() would report for match m."""
+    groups = m.re.groups
+    if groups == 0:
+        return m.group()
+    if groups == 1:
+        return m.group(1) or ""
+    return m.groups("")
+
+
+class LineIndex:
+    """Newline offset table for mapping buffer offsets back to 1-based line numbers."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.starts = [0] if text else []
+        self.starts.extend(m.end() for m in NEWLINE.finditer(text))
+        if self.starts and self.starts[-1] == len(text) and len(self.starts) > 1:
+            self.starts.pop()  # trailing newline does not start a new line
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line_of(self, offset: int) -> int:
+        return bisect_right(self.starts, offset)
+
+    def line(self, line_no: int) -> str:
+        """Return line `line_no` (1-based) with its newline, like readlines()."""
+        start = self.starts[line_no - 1]
+        end = self.starts[line_no] if line_no < len(self.starts) else len(self.text)
+        return self.text[start:end]
+
+
+class AnchorIndex:
+    """
+    Multi-literal index mapping required anchors to the patterns that need them.
+
+    Short text is scanned once with a merged alternation of every anchor (the
+    regex engine plays the role of an Aho-Corasick automaton); long buffers
+    test each distinct anchor with a substring search, which is faster there.
+    """
+
+    def __init__(self, anchors: dict):
+        self.anchors = anchors
+        # The scanner reports only the longest anchor at each position, so an
+        # anchor also owns the patterns of every anchor that is its prefix.
+        self.owners = {
+            literal: set().union(
+                *(names for other, names in anchors.items() if literal.startswith(other))
+            )
+            for literal in anchors
+        }
+        self.scanner = None
+        if anchors:
+            alternation = "|".join(
+                re.escape(l) for l in sorted(anchors, key=len, reverse=True)
+            )
+            self.scanner = re.compile(f"(?=({alternation}))")
+
+    def match(self, folded: str, found: set, total: int) -> set:
+        """Add the patterns whose anchors occur in folded text to found."""
+        if self.scanner is None:
+            return found
+
+        if len(folded) >= ANCHOR_SEARCH_THRESHOLD:
+            for literal, names in self.anchors.items():
+                if not names <= found and literal in folded:
+                    found |= names
+            return found
+
+        for m in self.scanner.finditer(folded):
+            found |= self.owners[m.group(1)]
+            if len(found) == total:
+                break
+        return found
+
+
+class DetectionEngine:
+    """
+    Compiled detector for the configured regex patterns.
+
+    When the engine starts, a required literal anchor is extracted from every
+    pattern (e.g. `AKIA`, `sk-`, `-----BEGIN`, `jdbc:`) and patterns without
+    one are gated on containing a digit where possible. Only patterns whose
+    anchors occur in the text are run with findall, so the result is identical
+    to running every pattern while most text is rejected in a single pass.
+    """
+
+    def __init__(self, patterns: dict, flags=re.IGNORECASE):
+        self.patterns = {k: re.compile(v, flags) for k, v in patterns.items()}
+        self.unanchored = set()
+        self.digit_gated = set()
+        self.line_safe = {k for k, v in patterns.items() if line_safe(v, flags)}
+
+        anchors = {}
+        for name, source in patterns.items():
+            literals = required_literals(source, flags)
+            if literals:
+                for literal in literals:
+                    anchors.setdefault(literal, set()).add(name)
+            elif requires_digit(source, flags):
+                self.digit_gated.add(name)
+            else:
+                self.unanchored.add(name)
+
+        self.index = AnchorIndex(anchors)
+
+    def candidates(self, text: str) -> set:
+        """Return the names of patterns that can possibly match text."""
+        found = set(self.unanchored)
+        if self.digit_gated and DIGIT.search(text):
+            found |= self.digit_gated
+        return self.index.match(fold_case(text), found, len(self.patterns))
+
+    def findall(self, text: str) -> dict:
+        """Return {pattern_name: pattern.findall(text)} for patterns that match."""
+        hits = {}
+        if not text:
+            return hits
+
+        candidates = self.candidates(text)
+        for name, pattern in self.patterns.items():
+            if name not in candidates:
+                continue
+            found = pattern.findall(text)
+            if found:
+                hits[name] = found
+        return hits
+
+    def findall_lines(
+        self, text: str, lines: LineIndex = None, keep_before=None, resume=None
+    ) -> list:
+        """
+        Scan a whole buffer and return [(line_no, hits)] for every line with
+        hits, where hits is exactly what findall() would return for that line.
+
+        Line-safe patterns run once over the buffer and their match offsets are
+        mapped back to lines; other patterns only run on the lines that contain
+        one of their anchors. If keep_before is given, matches starting at or
+        after that offset are left to the next overlapping block.
+
+        `resume` maps pattern names to the offset where their search starts,
+        as findall() would continue after the previous piece of a split line;
+        it is updated with the end of the last match kept for each pattern.
+        """
+        if not text:
+            return []
+        lines = lines or LineIndex(text)
+        folded = fold_case(text)
+        candidates = self.index.match(folded, set(self.unanchored), len(self.patterns))
+        if self.digit_gated and DIGIT.search(text):
+            candidates |= self.digit_gated
+        limit = len(text) if keep_before is None else keep_before
+        resume = {} if resume is None else resume
+
+        per_line = {}
+        for name, pattern in self.patterns.items():
+            if name not in candidates:
+                continue
+            pos = resume.get(name, 0)
+
+            if name in self.line_safe:
+                for m in pattern.finditer(text, pos):
+                    if m.start() >= limit:
+                        break
+                    line_hits = per_line.setdefault(lines.line_of(m.start()), {})
+                    line_hits.setdefault(name, []).append(_findall_value(m))
+                    resume[name] = m.end()
+                continue
+
+            for line_no in sorted(self._candidate_lines(name, folded, lines)):
+                line = lines.line(line_no)
+                start = lines.starts[line_no - 1]
+                end = start + len(line)
+                if end <= pos:
+                    continue
+                if start >= pos and end <= limit:
+                    found = pattern.findall(line)
+                else:
+                    if start >= pos:
+                        matches = pattern.finditer(line)
+                    else:
+                        # Searching the buffer keeps the \b context before pos
+                        matches = pattern.finditer(text, pos, end)
+                        start = 0
+                    found = []
+                    for m in matches:
+                        if start + m.start() >= limit:
+                            break
+                        found.append(_findall_value(m))
+                        resume[name] = start + m.end()
+                if found:
+                    per_line.setdefault(line_no, {})[name] = found
+
+        # Restore pattern order within each line, as the per-line loop produced.
+        order = {name: i for i, name in enumerate(self.patterns)}
+        return [
+            (line_no, dict(sorted(per_line[line_no].items(), key=lambda kv: order[kv[0]])))
+            for line_no in sorted(per_line)
+        ]
+
+    def _candidate_lines(self, name: str, folded: str, lines: LineIndex) -> set:
+        if name in self.unanchored:
+            return set(range(1, len(lines) + 1))
+        if name in self.digit_gated:
+            return {lines.line_of(m.start()) for m in DIGIT_LINE.finditer(folded)}
+
+        line_nos = set()
+        for literal, names in self.index.anchors.items():
+            if name not in names:
+                continue
+            pos = folded.find(literal)
+            while pos != -1:
+                line_nos.add(lines.line_of(pos))
+                pos = folded.find(literal, pos + 1)
+        return line_nos
@@ -0,0 +1,284 @@
+# file_scanner.py
+
+import io
+import os
+import re
+import sys
+import hashlib
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from openpyxl import load_workbook
+from docx import Document
+from PyPDF2 import PdfReader
+from detection import DetectionEngine, LineIndex
+from text_reader import PIECE_CONTEXT, iter_text_windows
+
+TEXT_EXTENSIONS = [".txt", ".csv", ".py", ".js", ".java", ".go", ".ts"]
+
+# Windows priority classes and the equivalent POSIX nice increments
+PRIORITY_CLASSES = {"normal": 0x0020, "below_normal": 0x4000, "idle": 0x0040}
+NICE_LEVELS = {"normal": 0, "below_normal": 10, "idle": 19}
+
+# Per-process state of scan pool workers, set up by init_worker
+worker_detector = None
+worker_text_scan = None
+
+
+def get_file_hash(filepath: Path):
+    """Simple file hash based on size and modification time"""
+    try:
+        stat = filepath.stat()
+        return f"{stat.st_size}_{int(stat.st_mtime)}"
+    except:
+        return None
+
+
+def content_digest():
+    """Hash object for content hashes; feed it the file's bytes"""
+    return hashlib.blake2b(digest_size=16)
+
+
+def get_content_hash(filepath: Path, chunk_bytes=1024 * 1024):
+    """BLAKE2b digest of the file contents"""
+    try:
+        digest = content_digest()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_bytes), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except:
+        return None
+
+
+def extract_findings(filepath: Path, detector, text_scan_config, hash_content=True):
+    """
+    Run the detector over a file and return (hits, sensitive_context,
+    content_hash). The content hash is computed from the same read as the
+    scan; it is None when hash_content is False (the caller already has
+    it). Parsing errors are raised to the caller.
+    """
+    hits = {}
+    sensitive_context = []  # Store context around sensitive data
+    ext = filepath.suffix.lower()
+    digest = content_digest() if hash_content else None
+
+    if ext not in TEXT_EXTENSIONS:
+        # Document parsers read from memory, so the file is read only once
+        with open(filepath, "rb") as f:
+            data = f.read()
+        if digest:
+            digest.update(data)
+        source = io.BytesIO(data)
+        del data
+
+    if ext in TEXT_EXTENSIONS:
+        max_bytes = text_scan_config["max_bytes_per_file"]
+        if max_bytes and filepath.stat().st_size > max_bytes:
+            logging.info(f"Scanning first {max_bytes} bytes of {filepath}")
+
+        # Stream the file in blocks of whole lines, scanning each block
+        # once and mapping hits back to line numbers
+        last_line = None
+        resume = {}
+        for window in iter_text_windows(
+            filepath,
+            text_scan_config["block_bytes"],
+            max_bytes,
+            text_scan_config["overlap_chars"],
+            digest=digest,
+        ):
+            lines = LineIndex(window.text)
+            line_hits_list = detector.findall_lines(
+                window.text, lines, window.keep_before, resume
+            )
+            if window.keep_before is None:
+                resume = {}
+            else:
+                # The next piece of this overlong line starts PIECE_CONTEXT
+                # characters before the cut; carry on from where findall would
+                shift = window.keep_before - PIECE_CONTEXT
+                resume = {
+                    name: max(resume.get(name, 0), window.keep_before) - shift
+                    for name in detector.patterns
+                }
+            for rel_idx, line_hits in line_hits_list:
+                if not window.first <= rel_idx <= window.last:
+                    continue  # neighbour line, reported with its own block
+                idx = window.line_offset + rel_idx
+                line = lines.line(rel_idx)
+
+                if idx != last_line:
+                    # Get context: current line + surrounding lines
+                    context_lines = []
+                    for i in range(max(1, rel_idx - 1), min(len(lines), rel_idx + 1) + 1):
+                        context_lines.append(
+                            f"L{window.line_offset + i}: {lines.line(i).strip()}"
+                        )
+
+                    context = "\n".join(context_lines)
+                    sensitive_context.append(context[:300])
+
+                for k, v in line_hits.items():
+                    entries = hits.setdefault(k, [])
+                    if entries and entries[-1]["line"] == idx:
+                        # Same overlong line split across blocks
+                        entries[-1]["matches"].extend(v)
+                    else:
+                        entries.append(
+                            {"line": idx, "snippet": line[:200], "matches": v}
+                        )
+                last_line = idx
+
+    elif ext == ".docx":
+        doc = Document(source)
+        paragraphs = [p.text for p in doc.paragraphs]
+
+        for idx, p_text in enumerate(paragraphs, start=1):
+            line_hits = detector.findall(p_text)
+            if line_hits:
+                # Get context: current paragraph + surrounding
+                context_paras = []
+                for i in range(max(0, idx - 2), min(len(paragraphs), idx + 1)):
+                    if paragraphs[i].strip():  # Skip empty paragraphs
+                        context_paras.append(f"P{i+1}: {paragraphs[i].strip()}")
+
+                context = "\n".join(context_paras)
+                sensitive_context.append(context[:300])
+
+                for k, v in line_hits.items():
+                    hits.setdefault(k, []).append(
+                        {"line": idx, "snippet": p_text[:200], "matches": v}
+                    )
+
+    elif ext in [".xlsx", ".xls"]:
+        wb = load_workbook(source, data_only=True)
+        for sheet in wb:
+            for row_idx, row in enumerate(
+                sheet.iter_rows(values_only=True), start=1
+            ):
+                for col_idx, cell in enumerate(row, start=1):
+                    if cell:
+                        cell_hits = detector.findall(str(cell))
+                        if cell_hits:
+                            # Get cell context (nearby cells)
+                            context_cells = []
+                            for r in range(
+                                max(1, row_idx - 1),
+                                min(sheet.max_row + 1, row_idx + 2),
+                            ):
+                                for c in range(
+                                    max(1, col_idx - 1),
+                                    min(sheet.max_column + 1, col_idx + 2),
+                                ):
+                                    try:
+                                        cell_val = sheet.cell(row=r, column=c).value
+                                        if cell_val:
+                                            context_cells.append(
+                                                f"R{r}C{c}: {str(cell_val)[:50]}"
+                                            )
+                                    except:
+                                        pass
+
+                            context = " | ".join(context_cells[:5])  # Limit context
+                            sensitive_context.append(context[:300])
+
+                            for k, v in cell_hits.items():
+                                hits.setdefault(k, []).append(
+                                    {
+                                        "line": f"Sheet:{sheet.title} Row:{row_idx} Col:{col_idx}",
+                                        "snippet": str(cell)[:200],
+                                        "matches": v,
+                                    }
+                                )
+
+    elif ext == ".pdf":
+        reader = PdfReader(source)
+        for page_idx, page in enumerate(reader.pages, start=1):
+            text = page.extract_text() or ""
+            lines = text.splitlines()
+
+            for line_idx, line in enumerate(lines, start=1):
+                line_hits = detector.findall(line)
+                if line_hits:
+                    # Get context: surrounding lines on the page
+                    context_lines = []
+                    for i in range(
+                        max(0, line_idx - 2), min(len(lines), line_idx + 1)
+                    ):
+                        context_lines.append(f"L{i+1}: {lines[i].strip()}")
+
+                    context = f"Page {page_idx}: " + "\n".join(context_lines)
+                    sensitive_context.append(context[:300])
+
+                    for k, v in line_hits.items():
+                        hits.setdefault(k, []).append(
+                            {
+                                "line": f"Page:{page_idx} Line:{line_idx}",
+                                "snippet": line[:200],
+                                "matches": v,
+                            }
+                        )
+
+    return hits, sensitive_context, digest.hexdigest() if digest else None
+
+
+# ---------------- SCAN POOL WORKERS ----------------
+def lower_process_priority(priority: str):
+    """Drop the current process priority so scanning doesn't slow the user down"""
+    if not priority or priority == "normal":
+        return
+    try:
+        if os.name == "nt":
+            import ctypes
+
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(
+                kernel32.GetCurrentProcess(), PRIORITY_CLASSES[priority]
+            )
+        else:
+            os.nice(NICE_LEVELS[priority])
+    except Exception as e:
+        logging.warning(f"Could not set scan worker priority {priority}: {e}")
+
+
+@contextmanager
+def worker_spawn_guard():
+    """
+    Spawned pool workers re-run the parent's main script as __mp_main__,
+    which for the agent means win32clipboard, pynput, the OpenAI client and
+    logging.basicConfig in every worker. While the main script's path is
+    hidden, workers start with only the modules their tasks import.
+    """
+    main = sys.modules["__main__"]
+    main_path = getattr(main, "__file__", None)
+    if main_path is not None:
+        del main.__file__
+    try:
+        yield
+    finally:
+        if main_path is not None:
+            main.__file__ = main_path
+
+
+def init_worker(patterns, text_scan_config, priority):
+    global worker_detector, worker_text_scan
+    lower_process_priority(priority)
+    worker_detector = DetectionEngine(patterns, re.IGNORECASE)
+    worker_text_scan = text_scan_config
+
+
+def scan_path(file_str: str, hash_content=True):
+    """
+    Pool task: return
+    (file_str, file_hash, content_hash, hits, sensitive_context, error)
+    """
+    filepath = Path(file_str)
+    file_hash = get_file_hash(filepath)
+    try:
+        hits, sensitive_context, content_hash = extract_findings(
+            filepath, worker_detector, worker_text_scan, hash_content
+        )
+    except Exception as e:
+        return file_str, file_hash, None, None, None, f"{type(e).__name__}: {e}"
+    return file_str, file_hash, content_hash, hits, sensitive_context, None
@@ -0,0 +1,265 @@
+# file_walker.py
+
+import os
+import re
+import time
+import hashlib
+
+# Absolute rules (C:\Windows) only match from the start of a path
+ABSOLUTE_RULE = re.compile(r"^[A-Za-z]:\\")
+
+
+class ExclusionMatcher:
+    """
+    EXCLUDE_DIRS compiled once: bare names (node_modules, Thumbs.db) go in a
+    set matched against single path components, rules with a separator or
+    wildcard become one combined regex matched on whole components.
+    """
+
+    def __init__(self, rules):
+        self.names = set()
+        path_patterns = []
+        for rule in rules:
+            rule = rule.replace("/", "\\").rstrip("\\")
+            if not rule:
+                continue
+            if "\\" not in rule and "*" not in rule:
+                self.names.add(rule.lower())
+                continue
+            # ".*" and "*" are wildcards for a single path component
+            parts = rule.replace(".*", "*").split("*")
+            body = r"[^\\]*".join(re.escape(part) for part in parts)
+            start = "^" if ABSOLUTE_RULE.match(rule) else r"(?:^|\\)"
+            path_patterns.append(start + body + r"(?:\\|$)")
+        self.path_re = (
+            re.compile("|".join(path_patterns), re.IGNORECASE)
+            if path_patterns
+            else None
+        )
+
+    def match_name(self, name: str) -> bool:
+        return name.lower() in self.names
+
+    def match_path(self, path: str) -> bool:
+        return bool(self.path_re and self.path_re.search(path.replace("/", "\\")))
+
+    def __call__(self, path) -> bool:
+        """Return True if any component or rule of the path is excluded."""
+        path = str(path).replace("/", "\\")
+        for part in path.split("\\"):
+            if part and part.lower() in self.names:
+                return True
+        return self.match_path(path)
+
+
+def iter_files(base_dir, extensions, excluded, on_error=None, recursive=True):
+    """
+    Yield paths of files under base_dir whose extension is in `extensions`
+    (only those directly in base_dir unless `recursive`).
+
+    Uses os.scandir type information (no extra stat or resolve per entry),
+    does not follow directory symlinks/junctions and never descends into
+    excluded directories. Only entries below base_dir are checked, so
+    callers should test base_dir itself.
+    """
+    extensions = {ext.lower() for ext in extensions}
+    stack = [str(base_dir)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError as e:
+            if on_error:
+                on_error(current, e)
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if (
+                        recursive
+                        and not excluded.match_name(entry.name)
+                        and not excluded.match_path(entry.path)
+                    ):
+                        subdirs.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in extensions:
+                    if (
+                        entry.is_file()
+                        and not excluded.match_name(entry.name)
+                        and not excluded.match_path(entry.path)
+                    ):
+                        yield entry.path
+            except OSError:
+                continue
+        # Walk subdirectories in listing order
+        stack.extend(reversed(subdirs))
+
+
+def path_dir(path: str):
+    """Parent directory, computed the same way as the server does"""
+    return path[: max(path.rfind("\\"), path.rfind("/"), 0)]
+
+
+def directory_digests(paths):
+    """Digest of the sorted file list of every directory, for sync reconciliation"""
+    by_dir = {}
+    for path in paths:
+        by_dir.setdefault(path_dir(path), []).append(path)
+    return {
+        directory: hashlib.blake2b(
+            "\n".join(sorted(files)).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        for directory, files in by_dir.items()
+    }
+
+
+class FileInventory:
+    """
+    Candidate files to scan, built once per scan cycle and kept between
+    cycles so sync and scanning read the same list without walking again.
+    Change notifications keep it current between walks.
+    """
+
+    def __init__(self, base_dirs, extensions, excluded):
+        self.base_dirs = base_dirs
+        self.extensions = {ext.lower() for ext in extensions}
+        self.excluded = excluded
+        self.files = {}  # base_dir -> {path: None}, in walk order
+        # Directory index for removals: dir -> file paths directly in it,
+        # and dir -> subdirectories with candidate files somewhere below
+        self.dir_files = {}
+        self.subdirs = {}
+        self.drive_stats = {}  # base_dir -> {"files", "seconds", "errors"}
+        self.built_at = None
+
+    def refresh(self):
+        """Walk every base directory again and return the drive stats."""
+        files, drive_stats = {}, {}
+        for base_dir in self.base_dirs:
+            if self.excluded(base_dir):
+                continue
+            errors = []
+            started = time.perf_counter()
+            files[base_dir] = dict.fromkeys(
+                iter_files(
+                    base_dir,
+                    self.extensions,
+                    self.excluded,
+                    on_error=lambda path, e: errors.append(path),
+                )
+            )
+            drive_stats[base_dir] = {
+                "files": len(files[base_dir]),
+                "seconds": round(time.perf_counter() - started, 3),
+                "errors": len(errors),
+            }
+        self.files, self.drive_stats = files, drive_stats
+        self.dir_files, self.subdirs = {}, {}
+        for paths in files.values():
+            for path in paths:
+                self._index(path)
+        self.built_at = time.time()
+        return drive_stats
+
+    def _index(self, path):
+        directory = path_dir(path)
+        files = self.dir_files.get(directory)
+        if files is None:
+            files = self.dir_files[directory] = set()
+            # Link the directory into its ancestors' subdirectory sets
+            child, parent = directory, path_dir(directory)
+            while child != parent:
+                children = self.subdirs.setdefault(parent, set())
+                if child in children:
+                    break
+                children.add(child)
+                child, parent = parent, path_dir(parent)
+        files.add(path)
+
+    def paths(self):
+        if self.built_at is None:
+            self.refresh()
+        return [path for paths in self.files.values() for path in paths]
+
+    def _base_of(self, path):
+        for base_dir in self.files:
+            if path.startswith(base_dir):
+                return base_dir
+        return None
+
+    def add(self, path: str) -> bool:
+        """Add a file if it is a scan candidate; returns True if it is one."""
+        base_dir = self._base_of(path)
+        if (
+            base_dir is None
+            or os.path.splitext(os.path.basename(path))[1].lower() not in self.extensions
+            or self.excluded(path)
+        ):
+            return False
+        self.files[base_dir][path] = None
+        self._index(path)
+        return True
+
+    def add_tree(self, path: str):
+        """Add all candidate files below a new directory and return them."""
+        if self._base_of(path) is None or self.excluded(path):
+            return []
+        found = [p for p in iter_files(path, self.extensions, self.excluded)]
+        for file_path in found:
+            self.add(file_path)
+        return found
+
+    def refresh_dir(self, path: str):
+        """
+        Re-list the files directly in a known directory. Returns
+        (files, removed): every candidate file now in it, and the files
+        that were dropped because they are gone.
+        """
+        if self._base_of(path) is None or self.excluded(path):
+            return [], []
+        present = list(iter_files(path, self.extensions, self.excluded, recursive=False))
+        gone = self.dir_files.get(path.rstrip("\\/"), set()).difference(present)
+        removed = []
+        for file_path in gone:
+            removed.extend(self.discard_tree(file_path))
+        for file_path in present:
+            self.add(file_path)
+        return present, removed
+
+    def knows_dir(self, path: str) -> bool:
+        """True if the inventory has candidate files in or below the directory."""
+        path = path.rstrip("\\/")
+        return path in self.dir_files or path in self.subdirs
+
+    def discard_tree(self, path: str):
+        """Drop a removed file or directory and return the files dropped."""
+        base_dir = self._base_of(path)
+        if base_dir is None:
+            return []
+        files = self.files[base_dir]
+        if path in files:
+            del files[path]
+            self.dir_files.get(path_dir(path), set()).discard(path)
+            return [path]
+
+        # Directory: collect its subtree through the index
+        path = path.rstrip("\\/")
+        self.subdirs.get(path_dir(path), set()).discard(path)
+        removed, stack = [], [path]
+        while stack:
+            directory = stack.pop()
+            removed.extend(self.dir_files.pop(directory, ()))
+            stack.extend(self.subdirs.pop(directory, ()))
+        for file_path in removed:
+            files.pop(file_path, None)
+        return removed
+
+    def __contains__(self, path):
+        path = str(path)
+        base_dir = self._base_of(path)
+        return base_dir is not None and path in self.files[base_dir]
+
+    def __len__(self):
+        return sum(len(paths) for paths in self.files.values())
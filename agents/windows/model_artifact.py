@@ -0,0 +1,172 @@
+# model_artifact.py
+
+import re
+import json
+import time
+import hashlib
+import unicodedata
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Arrays in the artifact, in checksum order
+ARRAYS = ("terms", "idf", "stop_words", "coef", "intercept", "classes")
+
+
+def checksum(arrays):
+    """sha256 over the arrays' dtypes, shapes and bytes"""
+    digest = hashlib.sha256()
+    for name in ARRAYS:
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def export_pipeline(pipeline, path, **metadata):
+    """
+    Save a fitted TfidfVectorizer + LogisticRegression pipeline as a plain
+    .npz artifact (no pickles). Extra keyword arguments go into the
+    artifact's metadata.
+    """
+    vectorizer = pipeline.steps[0][1]
+    classifier = pipeline.steps[-1][1]
+    if vectorizer.analyzer != "word" or vectorizer.tokenizer or vectorizer.preprocessor:
+        raise ValueError("Only the default word analyzer can be exported")
+
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, index in vectorizer.vocabulary_.items():
+        terms[index] = term
+    arrays = {
+        "terms": np.array(terms, dtype=str),
+        "idf": np.asarray(vectorizer.idf_, dtype=np.float64),
+        "stop_words": np.array(sorted(vectorizer.get_stop_words() or ()), dtype=str),
+        "coef": np.asarray(classifier.coef_, dtype=np.float64),
+        "intercept": np.asarray(classifier.intercept_, dtype=np.float64),
+        "classes": np.array([str(c) for c in classifier.classes_], dtype=str),
+    }
+    multi_class = getattr(classifier, "multi_class", "auto")
+    if multi_class not in ("ovr", "multinomial"):
+        # "auto": one-vs-rest for binary problems and liblinear
+        binary = len(classifier.classes_) <= 2
+        multi_class = "ovr" if binary or classifier.solver == "liblinear" else "multinomial"
+    metadata = dict(
+        metadata,
+        format_version=FORMAT_VERSION,
+        created_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        lowercase=vectorizer.lowercase,
+        strip_accents=vectorizer.strip_accents,
+        token_pattern=vectorizer.token_pattern,
+        ngram_range=list(vectorizer.ngram_range),
+        binary=vectorizer.binary,
+        sublinear_tf=vectorizer.sublinear_tf,
+        norm=vectorizer.norm,
+        multi_class=multi_class,
+        checksum=checksum(arrays),
+    )
+    # Write through a file object so numpy doesn't append another .npz
+    with open(path, "wb") as f:
+        np.savez(f, metadata=np.array(json.dumps(metadata)), **arrays)
+    return metadata
+
+
+class ArtifactModel:
+    """
+    Scores text with an exported artifact using NumPy only, giving the same
+    probabilities as the sklearn pipeline it came from. Exposes classes_
+    and predict_proba() like the pipeline, so callers can use either.
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.metadata = json.loads(str(data["metadata"]))
+            arrays = {name: data[name] for name in ARRAYS}
+
+        if self.metadata.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported model format {self.metadata.get('format_version')}"
+            )
+        if checksum(arrays) != self.metadata.get("checksum"):
+            raise ValueError("Model checksum mismatch")
+
+        self.version = self.metadata["checksum"][:16]
+        self.vocabulary = {term: i for i, term in enumerate(arrays["terms"].tolist())}
+        self.stop_words = frozenset(arrays["stop_words"].tolist())
+        self.idf = arrays["idf"]
+        self.coef = arrays["coef"]
+        self.intercept = arrays["intercept"]
+        self.classes_ = arrays["classes"]
+        self.token_pattern = re.compile(self.metadata["token_pattern"])
+        self.min_n, self.max_n = self.metadata["ngram_range"]
+
+    def _preprocess(self, text):
+        if self.metadata["lowercase"]:
+            text = text.lower()
+        strip_accents = self.metadata["strip_accents"]
+        if strip_accents == "ascii":
+            text = unicodedata.normalize("NFKD", text)
+            text = text.encode("ASCII", "ignore").decode("ASCII")
+        elif strip_accents == "unicode":
+            text = "".join(
+                c
+                for c in unicodedata.normalize("NFKD", text)
+                if not unicodedata.combining(c)
+            )
+        return text
+
+    def _terms(self, text):
+        """Word n-grams of text, as TfidfVectorizer builds them"""
+        tokens = [
+            t
+            for t in self.token_pattern.findall(self._preprocess(text))
+            if t not in self.stop_words
+        ]
+        for n in range(self.min_n, self.max_n + 1):
+            for i in range(len(tokens) - n + 1):
+                yield " ".join(tokens[i : i + n])
+
+    def transform(self, texts):
+        """Dense TF-IDF matrix; the vocabulary is small enough for that"""
+        X = np.zeros((len(texts), len(self.vocabulary)))
+        for row, text in enumerate(texts):
+            for term in self._terms(text):
+                index = self.vocabulary.get(term)
+                if index is not None:
+                    X[row, index] += 1
+
+        if self.metadata["binary"]:
+            np.minimum(X, 1, out=X)
+        elif self.metadata["sublinear_tf"]:
+            counted = X > 0
+            X[counted] = np.log(X[counted]) + 1
+        X *= self.idf
+
+        norm = self.metadata["norm"]
+        if norm:
+            lengths = (
+                np.abs(X).sum(axis=1)
+                if norm == "l1"
+                else np.sqrt((X * X).sum(axis=1))
+            )
+            lengths[lengths == 0] = 1
+            X /= lengths[:, None]
+        return X
+
+    def predict_proba(self, texts):
+        scores = self.transform(texts) @ self.coef.T + self.intercept
+
+        if self.metadata["multi_class"] == "ovr":
+            probabilities = 1 / (1 + np.exp(-scores))
+            if probabilities.shape[1] == 1:
+                return np.hstack([1 - probabilities, probabilities])
+            return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+        if scores.shape[1] == 1:
+            scores = np.hstack([-scores, scores])
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict(self, texts):
+        return self.classes_[self.predict_proba(texts).argmax(axis=1)]
@@ -0,0 +1,215 @@
+# scan_state.py
+
+import json
+import sqlite3
+import threading
+import time
+
+
+class ScanStateStore:
+    """
+    Persistent per-path scan state kept in a local SQLite database.
+
+    Each row holds the size/mtime fingerprint, content hash, last scan time
+    and the detector and classification results of the last scan. Rows are
+    also indexed by (size, content hash) so copies of already scanned files
+    can reuse their results. Rows are read on demand (no
+    full load at startup) and written in batched WAL transactions, so a crash
+    loses at most the last uncommitted batch, which is simply rescanned.
+    """
+
+    def __init__(self, path: str, commit_every=200):
+        self.path = path
+        self.commit_every = commit_every
+        self._con = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._con is None:
+            con = sqlite3.connect(self.path, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS scanned_files (
+                    path TEXT PRIMARY KEY,
+                    fingerprint TEXT,
+                    content_hash TEXT,
+                    scanned_at REAL,
+                    hits TEXT,
+                    context TEXT
+                )
+            """
+            )
+            # Columns added after the first release
+            for column in ["size INTEGER", "classification TEXT"]:
+                try:
+                    con.execute(f"ALTER TABLE scanned_files ADD COLUMN {column}")
+                except sqlite3.OperationalError:
+                    pass
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS idx_content "
+                "ON scanned_files(size, content_hash)"
+            )
+            # File list last acknowledged by the server, for delta syncs
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS sync_cursor "
+                "(id INTEGER PRIMARY KEY CHECK (id = 0), generation INTEGER)"
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS synced_files (path TEXT PRIMARY KEY)")
+            # Paths the server asked for but hasn't stored yet; offered again
+            con.execute("CREATE TABLE IF NOT EXISTS pending_files (path TEXT PRIMARY KEY)")
+            con.commit()
+            self._con = con
+        return self._con
+
+    def _row(self, where, params):
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT fingerprint, content_hash, scanned_at, hits, context, "
+                    f"classification FROM scanned_files WHERE {where} LIMIT 1",
+                    params,
+                )
+                .fetchone()
+            )
+        if not row:
+            return None
+        return {
+            "fingerprint": row[0],
+            "content_hash": row[1],
+            "scanned_at": row[2],
+            "hits": json.loads(row[3]) if row[3] else {},
+            "context": json.loads(row[4]) if row[4] else [],
+            "classification": json.loads(row[5]) if row[5] else None,
+        }
+
+    def get(self, path: str):
+        """Return the stored state for path, or None."""
+        return self._row("path=?", (path,))
+
+    def has_size(self, size):
+        """Cheap pre-check: is any hashed file of this size known?"""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT 1 FROM scanned_files "
+                    "WHERE size=? AND content_hash IS NOT NULL LIMIT 1",
+                    (size,),
+                )
+                .fetchone()
+            )
+        return row is not None
+
+    def find_content(self, size, content_hash):
+        """Return the stored state of any file with identical content, or None."""
+        if not content_hash:
+            return None
+        return self._row("size=? AND content_hash=?", (size, content_hash))
+
+    def put(
+        self,
+        path: str,
+        fingerprint,
+        size,
+        content_hash,
+        hits,
+        context,
+        classification=None,
+    ):
+        with self._lock:
+            self._connect().execute(
+                """
+                INSERT OR REPLACE INTO scanned_files
+                    (path, fingerprint, size, content_hash, scanned_at, hits,
+                     context, classification)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    path,
+                    fingerprint,
+                    size,
+                    content_hash,
+                    time.time(),
+                    json.dumps(hits),
+                    json.dumps(context),
+                    json.dumps(classification) if classification else None,
+                ),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def set_classification(self, path: str, fingerprint, classification):
+        """Attach a classification that arrived after the scan was stored."""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE scanned_files SET classification=? "
+                "WHERE path=? AND fingerprint=?",
+                (json.dumps(classification), path, fingerprint),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def forget(self, paths):
+        """Drop state for files that no longer exist."""
+        with self._lock:
+            self._connect().executemany(
+                "DELETE FROM scanned_files WHERE path=?", ((p,) for p in paths)
+            )
+            self._commit()
+
+    def sync_cursor(self):
+        """Return (generation, synced paths, pending paths) of the last sync, or None."""
+        with self._lock:
+            con = self._connect()
+            row = con.execute("SELECT generation FROM sync_cursor").fetchone()
+            if not row:
+                return None
+            paths = {path for (path,) in con.execute("SELECT path FROM synced_files")}
+            pending = {path for (path,) in con.execute("SELECT path FROM pending_files")}
+        return row[0], paths, pending
+
+    def save_sync(self, generation, paths, previous=(), pending=()):
+        """
+        Record the file list the server acknowledged at `generation`, and
+        the files it still has to receive a scan for.
+        """
+        paths = set(paths)
+        previous = set(previous)
+        with self._lock:
+            con = self._connect()
+            con.execute("DELETE FROM pending_files")
+            con.executemany(
+                "INSERT INTO pending_files (path) VALUES (?)", ((p,) for p in set(pending))
+            )
+            con.executemany(
+                "DELETE FROM synced_files WHERE path=?",
+                ((p,) for p in previous - paths),
+            )
+            con.executemany(
+                "INSERT OR IGNORE INTO synced_files (path) VALUES (?)",
+                ((p,) for p in paths - previous),
+            )
+            con.execute(
+                "INSERT OR REPLACE INTO sync_cursor (id, generation) VALUES (0, ?)",
+                (generation,),
+            )
+            self._commit()
+
+    def flush(self):
+        with self._lock:
+            if self._con is not None:
+                self._commit()
+
+    def _commit(self):
+        self._con.commit()
+        self._pending = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM scanned_files").fetchone()[0]
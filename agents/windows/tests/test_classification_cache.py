@@ -0,0 +1,16 @@
+from classification_cache import ClassificationCache, snippet_key
+
+
+def test_snippet_key_ignores_file_header_and_whitespace():
+    a = "FILE: report.txt (.TXT) | L1: SSN 123-45-6789"
+    b = "FILE: copy of report (2).txt (.TXT) | L1:  ssn 123-45-6789\n"
+    assert snippet_key("ai:v1", a) == snippet_key("ai:v1", b)
+    assert snippet_key("ai:v1", a) != snippet_key("ai:v2", a)
+    assert snippet_key("ai:v1", a) != snippet_key("ai:v1", "L1: SSN 123-45-6780")
+
+
+def test_cache_hit_for_renamed_copy(tmp_path):
+    cache = ClassificationCache(str(tmp_path / "cache.db"))
+    result = {"label": "Confidential", "confidence": 0.8}
+    cache.put("ai:v1", "FILE: a.txt (.TXT) | secret", result)
+    assert cache.get("ai:v1", "FILE: b.txt (.TXT) | secret") == result
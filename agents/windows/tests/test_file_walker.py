@@ -0,0 +1,34 @@
+import os
+
+from file_walker import ExclusionMatcher, FileInventory
+
+
+def make_tree(root, paths):
+    for path in paths:
+        full = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        open(full, "w").close()
+
+
+def test_discard_tree_and_refresh_dir(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, ["a/x.txt", "a/b/y.txt", "a/b/c/z.py", "q.txt", "a/b/n.bin"])
+    inventory = FileInventory([root], [".txt", ".py"], ExclusionMatcher([]))
+    assert len(inventory.paths()) == 4
+
+    os.remove(os.path.join(root, "a", "x.txt"))
+    make_tree(root, ["a/w.txt"])
+    present, removed = inventory.refresh_dir(os.path.join(root, "a"))
+    assert present == [os.path.join(root, "a", "w.txt")]
+    assert removed == [os.path.join(root, "a", "x.txt")]
+
+    removed = inventory.discard_tree(os.path.join(root, "a", "b"))
+    assert sorted(removed) == [
+        os.path.join(root, "a", "b", "c", "z.py"),
+        os.path.join(root, "a", "b", "y.txt"),
+    ]
+    assert not inventory.knows_dir(os.path.join(root, "a", "b"))
+    assert sorted(inventory.paths()) == [
+        os.path.join(root, "a", "w.txt"),
+        os.path.join(root, "q.txt"),
+    ]
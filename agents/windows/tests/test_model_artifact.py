@@ -0,0 +1,100 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from model_artifact import ArtifactModel, export_pipeline
+
+sklearn = pytest.importorskip("sklearn")
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TRAINING = [
+    ("Employee SSN 123-45-6789 and salary details", "Confidential"),
+    ("Customer credit card 4111 1111 1111 1111 expires 09/27", "Confidential"),
+    ("Private key and database password for production", "Confidential"),
+    ("Patient medical record with diagnosis and address", "Sensitive"),
+    ("Personal information: phone number and home address", "Sensitive"),
+    ("Customer record with email and date of birth", "Sensitive"),
+    ("Internal memo: team offsite planning for next quarter", "Internal"),
+    ("For team use: sprint notes and department update", "Internal"),
+    ("Internal discussion of the roadmap, do not forward", "Internal"),
+    ("Public announcement: new product launch next week", "Public"),
+    ("Marketing material for the public website", "Public"),
+    ("Public job posting for a security engineer", "Public"),
+]
+
+SNIPPETS = [
+    "FILE: payroll.csv (.CSV) | L2: Jane Doe, SSN 987-65-4321, salary 85000",
+    "Public press release about the product launch",
+    "Internal memo, internal memo: department update for the team",
+    "Café résumé with accents and unseen words entirely",
+    "",
+]
+
+
+def fit(vectorizer, classifier):
+    texts, labels = zip(*TRAINING)
+    return Pipeline([("tfidf", vectorizer), ("classifier", classifier)]).fit(
+        texts, labels
+    )
+
+
+@pytest.mark.parametrize(
+    "vectorizer, classifier",
+    [
+        # The agent's own configuration
+        (
+            TfidfVectorizer(max_features=1000, stop_words="english", ngram_range=(1, 2)),
+            LogisticRegression(random_state=42, multi_class="ovr"),
+        ),
+        (
+            TfidfVectorizer(sublinear_tf=True, strip_accents="unicode", norm="l1"),
+            LogisticRegression(random_state=42, multi_class="multinomial"),
+        ),
+        (
+            TfidfVectorizer(binary=True, strip_accents="ascii", lowercase=False),
+            LogisticRegression(random_state=42),
+        ),
+    ],
+)
+def test_artifact_matches_pickled_pipeline(tmp_path, vectorizer, classifier):
+    pipeline = pickle.loads(pickle.dumps(fit(vectorizer, classifier)))
+    export_pipeline(pipeline, tmp_path / "model.npz")
+    model = ArtifactModel(tmp_path / "model.npz")
+
+    assert list(model.classes_) == list(pipeline.classes_)
+    np.testing.assert_allclose(
+        model.predict_proba(SNIPPETS), pipeline.predict_proba(SNIPPETS), atol=1e-9
+    )
+    assert list(model.predict(SNIPPETS)) == list(pipeline.predict(SNIPPETS))
+
+
+def test_shipped_artifact_matches_shipped_pickle():
+    try:
+        with open(os.path.join(AGENT_DIR, "dlp_model.pkl"), "rb") as f:
+            pipeline = pickle.load(f)
+    except Exception as e:
+        pytest.skip(f"dlp_model.pkl needs the sklearn/numpy it was saved with: {e}")
+    model = ArtifactModel(os.path.join(AGENT_DIR, "dlp_model.npz"))
+
+    np.testing.assert_allclose(
+        model.predict_proba(SNIPPETS), pipeline.predict_proba(SNIPPETS), atol=1e-9
+    )
+
+
+def test_tampered_artifact_is_rejected(tmp_path):
+    path = tmp_path / "model.npz"
+    export_pipeline(fit(TfidfVectorizer(), LogisticRegression()), path)
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    arrays["coef"] = arrays["coef"] * 2
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+    with pytest.raises(ValueError, match="checksum"):
+        ArtifactModel(path)
@@ -0,0 +1,125 @@
+# text_reader.py
+
+import codecs
+import io
+import locale
+from collections import namedtuple
+
+# Neighbour lines are only used for the (300 char) context snippet.
+MAX_NEIGHBOUR_CHARS = 1000
+
+# Characters before the cut repeated at the start of the next piece of an
+# overlong line, so \b and short lookbehinds see the same text as in the line
+PIECE_CONTEXT = 16
+
+TextWindow = namedtuple(
+    "TextWindow", ["text", "line_offset", "first", "last", "keep_before"]
+)
+TextWindow.__doc__ = """
+A block of whole lines plus one neighbouring line on each side.
+
+Lines `first`..`last` (1-based, relative to `text`) belong to the block;
+absolute line numbers are `line_offset + n`. When `keep_before` is set the
+block is a piece of an overlong line and only matches starting before that
+offset belong to it.
+"""
+
+
+def iter_text_blocks(
+    path, block_bytes, max_bytes=None, overlap=4096, encoding=None, digest=None
+):
+    """
+    Decode a text file incrementally and yield (line_no, text, keep_before).
+
+    Blocks end on a line break so per-line matches never span two blocks.
+    A line longer than four blocks is split into pieces: each piece keeps
+    only the matches that start before its last `overlap` characters
+    (keep_before), and the next piece starts PIECE_CONTEXT characters before
+    that cut. The caller resumes the search there so no match is reported
+    twice. At most `max_bytes` are scanned; if a hashlib `digest` is given it
+    is fed the whole file, including any part past `max_bytes`.
+    """
+    encoding = encoding or locale.getpreferredencoding(False)
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(errors="ignore"), translate=True
+    )
+    max_line = block_bytes * 4
+    line_no = 1
+    remaining = max_bytes
+    carry = ""
+
+    with open(path, "rb") as f:
+        while True:
+            size = block_bytes if remaining is None else min(block_bytes, remaining)
+            raw = f.read(size) if size > 0 else b""
+            if remaining is not None:
+                remaining -= len(raw)
+            if digest is not None:
+                digest.update(raw)
+            data = carry + decoder.decode(raw, final=not raw)
+            if not raw:
+                if data:
+                    yield line_no, data, None
+                if digest is not None:
+                    for rest in iter(lambda: f.read(block_bytes), b""):
+                        digest.update(rest)
+                return
+
+            cut = data.rfind("\n") + 1
+            if cut:
+                block, carry = data[:cut], data[cut:]
+                yield line_no, block, None
+                line_no += block.count("\n")
+            elif len(data) > max_line:
+                keep_before = len(data) - overlap
+                yield line_no, data, keep_before
+                carry = data[keep_before - PIECE_CONTEXT :]
+            else:
+                carry = data
+
+
+def _first_line(text):
+    end = text.find("\n") + 1
+    return text[: end or len(text)][:MAX_NEIGHBOUR_CHARS]
+
+
+def _last_line(text):
+    # Head of the line, like _first_line; it still has to end the line
+    start = text.rfind("\n", 0, len(text) - 1) + 1
+    line = text[start:]
+    if len(line) <= MAX_NEIGHBOUR_CHARS:
+        return line
+    return line[:MAX_NEIGHBOUR_CHARS] + "\n"
+
+
+def _window(line_no, block, keep_before, prev_line, next_line):
+    lead = 1 if prev_line else 0
+    line_count = block.count("\n") + (0 if block.endswith("\n") else 1)
+    if keep_before is not None:
+        keep_before += len(prev_line)
+    return TextWindow(
+        text=prev_line + block + next_line,
+        line_offset=line_no - 1 - lead,
+        first=1 + lead,
+        last=lead + line_count,
+        keep_before=keep_before,
+    )
+
+
+def iter_text_windows(
+    path, block_bytes, max_bytes=None, overlap=4096, encoding=None, digest=None
+):
+    """Yield TextWindow blocks of a text file, holding at most two blocks in memory."""
+    pending = None
+    prev_line = ""
+    for line_no, block, keep_before in iter_text_blocks(
+        path, block_bytes, max_bytes, overlap, encoding, digest
+    ):
+        if pending:
+            ends_line = pending[1].endswith("\n")
+            yield _window(*pending, _first_line(block) if ends_line else "")
+        pending = (line_no, block, keep_before, prev_line)
+        prev_line = _last_line(block) if block.endswith("\n") else ""
+
+    if pending:
+        yield _window(*pending, "")
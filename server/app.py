@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 import os
+import gzip
+import time
 import json
+import hashlib
+import threading
 import pymysql
 import jwt
+from collections import Counter
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask import (
@@ -17,6 +22,9 @@ from flask import (
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
+from db_pool import ConnectionPool
+from ingest_queue import IngestQueue, QueueFull
+from query_cache import TTLCache
 
 # ---------------- LOAD ENV ----------------
 load_dotenv()
@@ -49,7 +57,7 @@ def get_server_connection():
     )
 
 
-def get_db():
+def connect_db():
     return pymysql.connect(
         host=DB_HOST,
         port=DB_PORT,
@@ -60,6 +68,51 @@ def get_db():
     )
 
 
+DB_POOL = ConnectionPool(
+    connect_db,
+    size=int(os.getenv("DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+    ping_interval=float(os.getenv("DB_POOL_PING_INTERVAL", "30")),
+)
+
+
+def get_db():
+    """Pooled connection; con.close() returns it to the pool"""
+    return DB_POOL.get()
+
+
+def column_exists(cur, table, column):
+    cur.execute(
+        """
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME=%s
+        """,
+        (table, column),
+    )
+    return cur.fetchone() is not None
+
+
+def index_exists(cur, table, index):
+    cur.execute(
+        """
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s AND INDEX_NAME=%s
+        LIMIT 1
+        """,
+        (table, index),
+    )
+    return cur.fetchone() is not None
+
+
+FINAL_LABEL_COLUMNS = [
+    ("final_label", "VARCHAR(64)"),
+    ("final_confidence", "DECIMAL(5,3)"),
+    ("tier", "VARCHAR(16)"),
+]
+
+
 def init_db():
     try:
         srv = get_server_connection()
@@ -73,117 +126,942 @@ def init_db():
 
     con = get_db()
     cur = con.cursor()
+    try:
+        # Users
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                email VARCHAR(120) UNIQUE,
+                full_name VARCHAR(120),
+                role VARCHAR(20),
+                password_hash VARCHAR(255)
+            )
+        """
+        )
 
-    # Users
-    cur.execute(
+        # Devices
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS devices (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                device_id VARCHAR(120) UNIQUE,
+                owner_email VARCHAR(120),
+                registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_device_id (device_id),
+                INDEX idx_registered_at (registered_at)
+            )
         """
-        CREATE TABLE IF NOT EXISTS users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            email VARCHAR(120) UNIQUE,
-            full_name VARCHAR(120),
-            role VARCHAR(20),
-            password_hash VARCHAR(255)
         )
-    """
-    )
 
-    # Devices
-    cur.execute(
+        # Policies
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS policies (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(120),
+                description TEXT,
+                rules JSON,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB
         """
-        CREATE TABLE IF NOT EXISTS devices (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            device_id VARCHAR(120) UNIQUE,
-            owner_email VARCHAR(120),
-            registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX idx_device_id (device_id),
-            INDEX idx_registered_at (registered_at)
         )
-    """
-    )
 
-    # Policies
-    cur.execute(
+        # Policy Assignments
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS policy_assignments (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_email VARCHAR(120),
+                device_id VARCHAR(120),
+                policy_id INT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (policy_id) REFERENCES policies(id)
+                    ON DELETE CASCADE ON UPDATE CASCADE,
+                INDEX idx_user_email (user_email),
+                INDEX idx_device_id (device_id),
+                INDEX idx_policy_id (policy_id)
+            ) ENGINE=InnoDB
         """
-        CREATE TABLE IF NOT EXISTS policies (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(120),
-            description TEXT,
-            rules JSON,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB
-    """
+        )
+
+        # Enhanced Events table with dual classification support
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                device_id VARCHAR(120),
+                user_email VARCHAR(120),
+                event_type VARCHAR(120),
+                target VARCHAR(255),
+                target_hash CHAR(32),
+                snippet TEXT,
+                detector_hits JSON,
+                ai_label VARCHAR(64),
+                ai_confidence DECIMAL(5,3),
+                sklearn_label VARCHAR(64),
+                sklearn_confidence DECIMAL(5,3),
+                policy_id INT,
+                final_label VARCHAR(64),
+                final_confidence DECIMAL(5,3),
+                tier VARCHAR(16),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (policy_id) REFERENCES policies(id)
+                    ON DELETE SET NULL ON UPDATE CASCADE,
+                INDEX idx_created_at (created_at),
+                INDEX idx_device_id (device_id),
+                INDEX idx_user_email (user_email),
+                INDEX idx_event_type (event_type),
+                INDEX idx_ai_label (ai_label),
+                INDEX idx_sklearn_label (sklearn_label),
+                INDEX idx_device_created (device_id, created_at),
+                UNIQUE KEY uq_file_target (device_id, event_type, target_hash)
+            ) ENGINE=InnoDB
+        """
+        )
+
+        # Add new columns to existing events table if they don't exist
+        try:
+            cur.execute("ALTER TABLE events ADD COLUMN sklearn_label VARCHAR(64)")
+        except:
+            pass  # Column already exists
+
+        try:
+            cur.execute("ALTER TABLE events ADD COLUMN sklearn_confidence DECIMAL(5,3)")
+        except:
+            pass  # Column already exists
+
+        # file_scan events are unique per (device, target): key them by target
+        # hash (NULL for other event types) so reports can upsert in bulk. Runs
+        # before the inventory and rollup backfills so they only see the rows
+        # that are kept. Each step is checked on its own, so a failed migration
+        # is retried at the next start instead of leaving the table without
+        # the key
+        if not column_exists(cur, "events", "target_hash"):
+            cur.execute("ALTER TABLE events ADD COLUMN target_hash CHAR(32)")
+        if not index_exists(cur, "events", "uq_file_target"):
+            cur.execute(
+                "UPDATE events SET target_hash=MD5(target) "
+                "WHERE event_type='file_scan' AND target IS NOT NULL "
+                "AND target_hash IS NULL"
+            )
+            # Keep the latest event per target; one grouping pass instead of
+            # a self-join on the unindexed target column
+            cur.execute(
+                """
+                DELETE e FROM events e
+                JOIN (
+                    SELECT device_id, target_hash, MAX(id) AS keep_id
+                    FROM events
+                    WHERE event_type='file_scan' AND target_hash IS NOT NULL
+                    GROUP BY device_id, target_hash
+                    HAVING COUNT(*) > 1
+                ) latest
+                  ON e.device_id=latest.device_id AND e.target_hash=latest.target_hash
+                WHERE e.event_type='file_scan' AND e.id < latest.keep_id
+            """
+            )
+            cur.execute(
+                "ALTER TABLE events ADD UNIQUE KEY uq_file_target "
+                "(device_id, event_type, target_hash)"
+            )
+
+        # Per-device file inventory: sync and token issuance read this instead
+        # of deriving the file list from events
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS device_files (
+                device_id VARCHAR(120) NOT NULL,
+                path_hash CHAR(32) NOT NULL,
+                path VARCHAR(1024) NOT NULL,
+                fingerprint VARCHAR(64),
+                last_scanned TIMESTAMP NULL,
+                ai_label VARCHAR(64),
+                ai_confidence DECIMAL(5,3),
+                sklearn_label VARCHAR(64),
+                sklearn_confidence DECIMAL(5,3),
+                final_label VARCHAR(64),
+                final_confidence DECIMAL(5,3),
+                tier VARCHAR(16),
+                PRIMARY KEY (device_id, path_hash)
+            ) ENGINE=InnoDB
+        """
+        )
+
+        # Label that stands for a finding and the tier that decided it (rules,
+        # sklearn or llm); ai_label only holds the LLM's answer
+        for table in ["events", "device_files"]:
+            for column, definition in FINAL_LABEL_COLUMNS:
+                if not column_exists(cur, table, column):
+                    cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+        # Backfill the inventory from existing file_scan events, latest first
+        cur.execute("SELECT COUNT(*) AS n FROM device_files")
+        if cur.fetchone()["n"] == 0:
+            cur.execute(
+                """
+                INSERT IGNORE INTO device_files
+                    (device_id, path_hash, path, last_scanned, ai_label, ai_confidence,
+                     sklearn_label, sklearn_confidence)
+                SELECT device_id, MD5(target), target, created_at, ai_label,
+                       ai_confidence, sklearn_label, sklearn_confidence
+                FROM events
+                WHERE event_type='file_scan' AND target IS NOT NULL
+                ORDER BY id DESC
+            """
+            )
+
+        # Per-device file sync cursor for delta syncs
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_sync_state (
+                device_id VARCHAR(120) PRIMARY KEY,
+                generation BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB
+        """
+        )
+
+        # Event counts per hour/day x device x event type x labels, kept up to
+        # date at ingest so charts don't aggregate the events table
+        for table, bucket_type, bucket_expr in ROLLUP_TABLES:
+            cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    bucket {bucket_type} NOT NULL,
+                    device_id VARCHAR(120) NOT NULL DEFAULT '',
+                    event_type VARCHAR(120) NOT NULL DEFAULT '',
+                    ai_label VARCHAR(64) NOT NULL DEFAULT '',
+                    sklearn_label VARCHAR(64) NOT NULL DEFAULT '',
+                    events BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (bucket, device_id, event_type, ai_label, sklearn_label),
+                    INDEX idx_device_bucket (device_id, bucket)
+                ) ENGINE=InnoDB
+            """
+            )
+            cur.execute(f"SELECT COUNT(*) AS n FROM {table}")
+            if cur.fetchone()["n"] == 0:
+                cur.execute(
+                    f"""
+                    INSERT INTO {table}
+                        (bucket, device_id, event_type, ai_label, sklearn_label, events)
+                    SELECT {bucket_expr}, COALESCE(device_id, ''),
+                           COALESCE(event_type, ''), COALESCE(ai_label, ''),
+                           COALESCE(sklearn_label, ''), COUNT(*)
+                    FROM events
+                    GROUP BY 1, 2, 3, 4, 5
+                """
+                )
+
+        # Optional retention overrides per device, event type or both; events
+        # outside every override keep EVENT_RETENTION_DAYS
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS retention_policies (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                device_id VARCHAR(120) NULL,
+                event_type VARCHAR(120) NULL,
+                retention_days INT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_scope (device_id, event_type)
+            ) ENGINE=InnoDB
+        """
+        )
+
+        # Add indexes if they don't exist
+        try:
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_events_sklearn_label ON events (sklearn_label)"
+            )
+        except:
+            pass
+
+        # ngram FULLTEXT indexes for substring search. With stopwords enabled
+        # the ngram parser drops every token containing one, so build without
+        try:
+            cur.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+        except:
+            pass
+        for index, columns in FULLTEXT_INDEXES.items():
+            try:
+                cur.execute(
+                    f"ALTER TABLE events ADD FULLTEXT INDEX {index} ({columns}) "
+                    "WITH PARSER ngram"
+                )
+            except:
+                pass  # Index already exists
+
+        con.commit()
+    finally:
+        cur.close()
+        con.close()
+
+
+# ---------------- FILE SYNC HELPERS ----------------
+SYNC_CHUNK_SIZE = 1000  # paths per IN (...) clause
+
+
+def chunked(items, size=SYNC_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def path_dir(path: str):
+    """Parent directory of an agent path (Windows or POSIX separators)"""
+    return path[: max(path.rfind("\\"), path.rfind("/"), 0)]
+
+
+def directory_digests(paths):
+    """Digest of the sorted file list of every directory; must match the agent"""
+    by_dir = {}
+    for path in paths:
+        by_dir.setdefault(path_dir(path), []).append(path)
+    return {
+        directory: hashlib.blake2b(
+            "\n".join(sorted(files)).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        for directory, files in by_dir.items()
+    }
+
+
+def path_hash(path: str):
+    """Key of a path in device_files; equal to MySQL MD5(path)"""
+    return hashlib.md5(path.encode("utf-8")).hexdigest()
+
+
+def known_device_files(cur, device_id, targets=None):
+    """Files in a device's inventory, optionally only those among `targets`"""
+    if targets is None:
+        cur.execute("SELECT path FROM device_files WHERE device_id=%s", (device_id,))
+        return set(row["path"] for row in cur.fetchall())
+
+    known = set()
+    for chunk in chunked(targets):
+        placeholders = ",".join(["%s"] * len(chunk))
+        cur.execute(
+            f"""
+            SELECT path FROM device_files
+            WHERE device_id=%s AND path_hash IN ({placeholders})
+            """,
+            (device_id,) + tuple(path_hash(p) for p in chunk),
+        )
+        known.update(row["path"] for row in cur.fetchall())
+    return known
+
+
+def delete_device_files(cur, device_id, targets):
+    """Drop deleted files from the inventory along with their file_scan events"""
+    deleted_count = 0
+    for chunk in chunked(targets):
+        placeholders = ",".join(["%s"] * len(chunk))
+        cur.execute(
+            f"""
+            DELETE FROM device_files
+            WHERE device_id=%s AND path_hash IN ({placeholders})
+            """,
+            (device_id,) + tuple(path_hash(p) for p in chunk),
+        )
+        deleted_count += cur.rowcount
+        # By target hash, so both statements use uq_file_target
+        where = (
+            f"device_id=%s AND event_type='file_scan' "
+            f"AND target_hash IN ({placeholders})"
+        )
+        params = (device_id,) + tuple(path_hash(p) for p in chunk)
+        subtract_from_rollups(cur, where, params)
+        cur.execute(f"DELETE FROM events WHERE {where}", params)
+    return deleted_count
+
+
+def upsert_device_files(cur, events):
+    """Record the latest scan of file_scan events in the device inventory"""
+    now = datetime.now()
+    rows = [
+        (
+            ev.get("device_id"),
+            path_hash(ev["target"]),
+            ev["target"],
+            ev.get("fingerprint"),
+            now,
+            (ev.get("ai_classification") or {}).get("label"),
+            (ev.get("ai_classification") or {}).get("confidence"),
+            (ev.get("sklearn_classification") or {}).get("label"),
+            (ev.get("sklearn_classification") or {}).get("confidence"),
+        )
+        + final_label(ev)
+        for ev in events
+        if ev.get("event_type") == "file_scan" and ev.get("target")
+    ]
+    if rows:
+        cur.executemany(
+            """
+            INSERT INTO device_files
+                (device_id, path_hash, path, fingerprint, last_scanned, ai_label,
+                 ai_confidence, sklearn_label, sklearn_confidence, final_label,
+                 final_confidence, tier)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                fingerprint=VALUES(fingerprint), last_scanned=VALUES(last_scanned),
+                ai_label=VALUES(ai_label), ai_confidence=VALUES(ai_confidence),
+                sklearn_label=VALUES(sklearn_label),
+                sklearn_confidence=VALUES(sklearn_confidence),
+                final_label=VALUES(final_label),
+                final_confidence=VALUES(final_confidence), tier=VALUES(tier)
+            """,
+            rows,
+        )
+
+
+def sync_generation(cur, device_id, lock=False):
+    cur.execute(
+        "SELECT generation FROM file_sync_state WHERE device_id=%s"
+        + (" FOR UPDATE" if lock else ""),
+        (device_id,),
     )
+    row = cur.fetchone()
+    return row["generation"] if row else 0
 
-    # Policy Assignments
+
+def bump_sync_generation(cur, device_id, generation):
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS policy_assignments (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_email VARCHAR(120),
-            device_id VARCHAR(120),
-            policy_id INT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (policy_id) REFERENCES policies(id)
-                ON DELETE CASCADE ON UPDATE CASCADE,
-            INDEX idx_user_email (user_email),
-            INDEX idx_device_id (device_id),
-            INDEX idx_policy_id (policy_id)
-        ) ENGINE=InnoDB
+        INSERT INTO file_sync_state (device_id, generation) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE generation=VALUES(generation)
+        """,
+        (device_id, generation + 1),
+    )
+    return generation + 1
+
+
+# ---------------- EVENT ROLLUPS ----------------
+# (table, bucket column type, SQL expression giving an event's bucket);
+# missing device/type/labels are stored as ''
+ROLLUP_TABLES = [
+    ("event_rollup_hourly", "DATETIME", "DATE_FORMAT(created_at, '%Y-%m-%d %H:00:00')"),
+    ("event_rollup_daily", "DATE", "DATE(created_at)"),
+]
+ROLLUP_BUCKET_FORMATS = {
+    "event_rollup_hourly": "%Y-%m-%d %H:00:00",
+    "event_rollup_daily": "%Y-%m-%d",
+}
+
+
+def apply_rollup_deltas(cur, deltas):
+    """
+    Add a Counter of (created_at, device_id, event_type, ai_label,
+    sklearn_label) -> change in event count to every rollup table.
     """
+    for table, fmt in ROLLUP_BUCKET_FORMATS.items():
+        buckets = Counter()
+        for (created_at, *dims), n in deltas.items():
+            buckets[(created_at.strftime(fmt),) + tuple(d or "" for d in dims)] += n
+        # Sorted so concurrent writers lock rollup rows in the same order
+        rows = sorted(key + (n,) for key, n in buckets.items() if n)
+        if rows:
+            cur.executemany(
+                f"""
+                INSERT INTO {table}
+                    (bucket, device_id, event_type, ai_label, sklearn_label, events)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE events=events+VALUES(events)
+                """,
+                rows,
+            )
+
+
+def subtract_from_rollups(cur, where, params):
+    """Remove the events matching `where` from the rollups; call before deleting them"""
+    cur.execute(
+        f"""
+        SELECT MIN(created_at) AS created_at, device_id, event_type,
+               ai_label, sklearn_label, COUNT(*) AS n
+        FROM events
+        WHERE {where}
+        GROUP BY DATE_FORMAT(created_at, '%%Y-%%m-%%d %%H'), device_id,
+                 event_type, ai_label, sklearn_label
+        """,
+        params,
     )
+    deltas = Counter()
+    for row in cur.fetchall():
+        key = (
+            row["created_at"],
+            row["device_id"],
+            row["event_type"],
+            row["ai_label"],
+            row["sklearn_label"],
+        )
+        deltas[key] -= row["n"]
+    apply_rollup_deltas(cur, deltas)
 
-    # Enhanced Events table with dual classification support
+
+def rollup_label_counts(cur, column, where_conditions, params, limit=10):
+    """Event counts per value of a label column, from the daily rollup"""
+    conditions = where_conditions + [f"{column} <> ''"]
     cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS events (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            device_id VARCHAR(120),
-            user_email VARCHAR(120),
-            event_type VARCHAR(120),
-            target VARCHAR(255),
-            snippet TEXT,
-            detector_hits JSON,
-            ai_label VARCHAR(64),
-            ai_confidence DECIMAL(5,3),
-            sklearn_label VARCHAR(64),
-            sklearn_confidence DECIMAL(5,3),
-            policy_id INT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (policy_id) REFERENCES policies(id)
-                ON DELETE SET NULL ON UPDATE CASCADE,
-            INDEX idx_created_at (created_at),
-            INDEX idx_device_id (device_id),
-            INDEX idx_user_email (user_email),
-            INDEX idx_event_type (event_type),
-            INDEX idx_ai_label (ai_label),
-            INDEX idx_sklearn_label (sklearn_label),
-            INDEX idx_device_created (device_id, created_at)
-        ) ENGINE=InnoDB
-    """
+        f"""
+        SELECT {column}, CAST(SUM(events) AS SIGNED) AS cnt
+        FROM event_rollup_daily
+        WHERE {" AND ".join(conditions)}
+        GROUP BY {column}
+        HAVING cnt > 0
+        ORDER BY cnt DESC
+        LIMIT %s
+        """,
+        params + [limit],
     )
+    return cur.fetchall()
 
-    # Add new columns to existing events table if they don't exist
+
+# ---------------- EVENT RETENTION ----------------
+# Expired events are deleted by primary key in short batches, one commit
+# each, so a purge never holds long locks against ingestion. Off unless
+# EVENT_RETENTION_DAYS or a retention policy sets a limit. file_scan events
+# are never purged by age: they describe files that still exist and leave
+# with the file (sync) or the device
+EVENT_RETENTION_DAYS = int(os.getenv("EVENT_RETENTION_DAYS", "0"))  # 0 = keep
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "2000"))
+RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "3600"))  # 0 = manual only
+
+
+def scope_match(device_id, event_type):
+    """SQL condition selecting the events of a retention scope"""
+    conditions, params = [], []
+    if device_id is not None:
+        conditions.append("device_id <=> %s")
+        params.append(device_id)
+    if event_type is not None:
+        conditions.append("event_type <=> %s")
+        params.append(event_type)
+    return " AND ".join(conditions) or "TRUE", params
+
+
+def retention_rules(cur):
+    """
+    (where, params) per retention scope with a limit. The most specific
+    policy wins: device + type, then device, then type, then the default.
+    """
+    cur.execute("SELECT device_id, event_type, retention_days FROM retention_policies")
+    scopes = [(None, None, EVENT_RETENTION_DAYS or None)] + [
+        (row["device_id"], row["event_type"], row["retention_days"] or None)
+        for row in cur.fetchall()
+    ]
+
+    def specificity(scope):
+        return (scope[0] is not None) * 2 + (scope[1] is not None)
+
+    rules = []
+    for device_id, event_type, days in scopes:
+        if not days:
+            continue
+        if event_type == "file_scan":
+            continue
+        where, params = scope_match(device_id, event_type)
+        where = (
+            f"created_at < NOW() - INTERVAL %s DAY "
+            f"AND NOT (event_type <=> 'file_scan') AND {where}"
+        )
+        params = [days] + params
+        # Leave events of more specific overlapping scopes to their own rule
+        for other in scopes:
+            if specificity(other) > specificity((device_id, event_type)) and (
+                device_id is None or other[0] is None or other[0] == device_id
+            ) and (event_type is None or other[1] is None or other[1] == event_type):
+                other_where, other_params = scope_match(other[0], other[1])
+                where += f" AND NOT ({other_where})"
+                params += other_params
+        rules.append((where, params))
+    return rules
+
+
+def purge_expired_events(con, batch_size=PURGE_BATCH_SIZE):
+    """Delete events past their retention; returns the number deleted"""
+    cur = con.cursor()
+    deleted_count = 0
     try:
-        cur.execute("ALTER TABLE events ADD COLUMN sklearn_label VARCHAR(64)")
-    except:
-        pass  # Column already exists
+        for where, params in retention_rules(cur):
+            while True:
+                cur.execute(
+                    f"""
+                    SELECT id, created_at, device_id, event_type, ai_label, sklearn_label
+                    FROM events
+                    WHERE {where}
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE
+                    """,
+                    params + [batch_size],
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                deltas = Counter(
+                    (
+                        row["created_at"],
+                        row["device_id"],
+                        row["event_type"],
+                        row["ai_label"],
+                        row["sklearn_label"],
+                    )
+                    for row in rows
+                )
+                apply_rollup_deltas(cur, Counter({k: -n for k, n in deltas.items()}))
+                placeholders = ",".join(["%s"] * len(rows))
+                cur.execute(
+                    f"DELETE FROM events WHERE id IN ({placeholders})",
+                    [row["id"] for row in rows],
+                )
+                deleted_count += cur.rowcount
+                con.commit()
+                if len(rows) < batch_size:
+                    break
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        cur.close()
+    if deleted_count:
+        FACET_CACHE.invalidate()
+        COUNT_CACHE.invalidate()
+    return deleted_count
+
+
+def run_retention():
+    """Background purge every RETENTION_INTERVAL seconds"""
+    while True:
+        time.sleep(RETENTION_INTERVAL)
+        try:
+            con = get_db()
+            try:
+                deleted_count = purge_expired_events(con)
+            finally:
+                con.close()
+            if deleted_count:
+                app.logger.info(f"Retention purge deleted {deleted_count} events")
+        except Exception as e:
+            app.logger.error(f"Retention purge error: {e}")
+
+
+# ---------------- EVENT INGESTION HELPERS ----------------
+def final_label(ev):
+    """
+    (label, confidence, tier) that stands for an event. Agents from before
+    the classification tiers only send an AI label, which was final.
+    """
+    final = ev.get("classification") or ev.get("ai_classification") or {}
+    return final.get("label"), final.get("confidence"), final.get("tier")
+
+
+def event_row(ev):
+    target = ev.get("target")
+    is_file = ev.get("event_type") == "file_scan" and target
+    return (
+        ev.get("device_id"),
+        ev.get("user_email"),
+        ev.get("event_type"),
+        target,
+        path_hash(target) if is_file else None,
+        ev.get("snippet"),
+        json.dumps(ev.get("detector_hits")) if ev.get("detector_hits") else None,
+        (ev.get("ai_classification") or {}).get("label"),
+        (ev.get("ai_classification") or {}).get("confidence"),
+        (ev.get("sklearn_classification") or {}).get("label"),
+        (ev.get("sklearn_classification") or {}).get("confidence"),
+        ev.get("policy_id"),
+    ) + final_label(ev)
+
+
+def existing_file_events(cur, rows):
+    """
+    Existing events of file_scan rows, as (device_id, target_hash) ->
+    (created_at, ai_label, sklearn_label)
+    """
+    by_device = {}
+    for row in rows:
+        if row[4]:
+            by_device.setdefault(row[0], set()).add(row[4])
+
+    existing = {}
+    for device_id, hashes in by_device.items():
+        for chunk in chunked(hashes):
+            placeholders = ",".join(["%s"] * len(chunk))
+            cur.execute(
+                f"""
+                SELECT target_hash, created_at, ai_label, sklearn_label FROM events
+                WHERE device_id=%s AND event_type='file_scan'
+                  AND target_hash IN ({placeholders})
+                """,
+                (device_id,) + tuple(chunk),
+            )
+            for row in cur.fetchall():
+                existing[(device_id, row["target_hash"])] = (
+                    row["created_at"],
+                    row["ai_label"],
+                    row["sklearn_label"],
+                )
+    return existing
+
+
+def write_events(cur, events):
+    """
+    Insert a batch of events; file_scan events replace the device's
+    previous event for the same target. Returns (new, updated) counts.
+    """
+    rows = [event_row(ev) for ev in events]
+    existing = existing_file_events(cur, rows)
+    cur.execute("SELECT NOW() AS now")
+    now = cur.fetchone()["now"]
+
+    # Rollup changes: replaced events keep their created_at, so their old
+    # labels move out of the same bucket the new ones go into
+    deltas = Counter()
+    updated_count = 0
+    for row in rows:
+        device_id, event_type, ai_label, sklearn_label = row[0], row[2], row[7], row[9]
+        created_at = now
+        if row[4]:
+            key = (device_id, row[4])
+            if key in existing:
+                updated_count += 1
+                created_at, old_ai, old_sklearn = existing[key]
+                deltas[(created_at, device_id, event_type, old_ai, old_sklearn)] -= 1
+            existing[key] = (created_at, ai_label, sklearn_label)
+        deltas[(created_at, device_id, event_type, ai_label, sklearn_label)] += 1
+
+    cur.executemany(
+        """
+        INSERT INTO events (device_id, user_email, event_type, target, target_hash,
+                            snippet, detector_hits, ai_label, ai_confidence,
+                            sklearn_label, sklearn_confidence, policy_id,
+                            final_label, final_confidence, tier)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        ON DUPLICATE KEY UPDATE
+            snippet=VALUES(snippet), detector_hits=VALUES(detector_hits),
+            ai_label=VALUES(ai_label), ai_confidence=VALUES(ai_confidence),
+            sklearn_label=VALUES(sklearn_label),
+            sklearn_confidence=VALUES(sklearn_confidence),
+            policy_id=VALUES(policy_id), final_label=VALUES(final_label),
+            final_confidence=VALUES(final_confidence), tier=VALUES(tier)
+        """,
+        rows,
+    )
+    upsert_device_files(cur, events)
+    apply_rollup_deltas(cur, deltas)
+    note_event_facets(rows)
+    return len(rows) - updated_count, updated_count
+
 
+# ---------------- INGESTION QUEUE ----------------
+# Agent reports are acknowledged once queued on local disk and written to
+# MySQL in batches by a background thread (set INGEST_ASYNC=0 to write
+# inside the request instead)
+INGEST_ASYNC = os.getenv("INGEST_ASYNC", "1") == "1"
+
+
+def write_event_batch(events):
+    con = get_db()
+    cur = con.cursor()
     try:
-        cur.execute("ALTER TABLE events ADD COLUMN sklearn_confidence DECIMAL(5,3)")
-    except:
-        pass  # Column already exists
+        write_events(cur, events)
+        con.commit()
+    finally:
+        cur.close()
+        con.close()
+
+
+INGEST_QUEUE = (
+    IngestQueue(
+        os.getenv("INGEST_QUEUE_PATH", "ingest_queue.db"),
+        write_event_batch,
+        batch_size=int(os.getenv("INGEST_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("INGEST_FLUSH_INTERVAL", "2")),
+        max_depth=int(os.getenv("INGEST_MAX_DEPTH", "100000")),
+    )
+    if INGEST_ASYNC
+    else None
+)
 
-    # Add indexes if they don't exist
+
+def enqueue_events(events):
+    """Queue events for the background writer; returns the response to send"""
     try:
+        depth = INGEST_QUEUE.put(events)
+    except QueueFull as e:
+        response = jsonify({"error": str(e), "queue_depth": INGEST_QUEUE.depth()})
+        response.status_code = 503
+        response.headers["Retry-After"] = "30"
+        return response
+    return jsonify(
+        {
+            "status": "queued",
+            "queued": len(events),
+            "queue_depth": depth,
+            "total_processed": len(events),
+        }
+    )
+
+
+# ---------------- EVENT LIST HELPERS ----------------
+# Dropdown values and filtered counts are cached in-process; facet lists
+# are dropped as soon as an ingested event brings a value they lack
+FACET_CACHE = TTLCache(int(os.getenv("FACET_CACHE_TTL", "600")))
+COUNT_CACHE = TTLCache(int(os.getenv("COUNT_CACHE_TTL", "60")), max_entries=1000)
+EVENTS_PER_PAGE = 10
+
+# Facet column -> position in event_row()
+FACET_COLUMNS = {"device_id": 0, "event_type": 2, "ai_label": 7, "sklearn_label": 9}
+
+
+def facet_values(cur, column):
+    """Sorted distinct non-null values of an events column, for filter dropdowns"""
+
+    def load():
         cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_events_sklearn_label ON events (sklearn_label)"
+            f"SELECT DISTINCT {column} FROM events "
+            f"WHERE {column} IS NOT NULL ORDER BY {column}"
         )
-    except:
-        pass
+        return [row[column] for row in cur.fetchall()]
 
-    con.commit()
-    cur.close()
-    con.close()
+    return FACET_CACHE.get(column, load)
+
+
+def note_event_facets(rows):
+    """Invalidate cached facet lists missing a value of newly written rows"""
+    for column, index in FACET_COLUMNS.items():
+        cached = FACET_CACHE.peek(column)
+        if cached is None:
+            continue
+        known = set(cached)
+        if any(row[index] is not None and row[index] not in known for row in rows):
+            FACET_CACHE.invalidate(column)
+
+
+def count_events(cur, where_clause, params):
+    """
+    Cached event count for a filter. Without filters, InnoDB's row estimate
+    is used instead of a full COUNT(*).
+    """
+
+    def load():
+        if not where_clause:
+            cur.execute(
+                "SELECT TABLE_ROWS AS total FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='events'"
+            )
+            row = cur.fetchone()
+            if row and row["total"] is not None:
+                return int(row["total"])
+        cur.execute(f"SELECT COUNT(*) AS total FROM events {where_clause}", params)
+        return cur.fetchone()["total"]
+
+    return COUNT_CACHE.get((where_clause, tuple(params)), load)
+
+
+def fetch_event_page(cur, columns, where_conditions, params, before=None, after=None):
+    """
+    One page of events, newest first, using keyset pagination on id: the
+    events older than `before`, or the page just newer than `after`
+    (after=0 gives the oldest page). Returns (events, has_newer, has_older).
+    """
+    conditions = list(where_conditions)
+    cursor_params = []
+    order = "DESC"
+    if after is not None:
+        conditions.append("id > %s")
+        cursor_params.append(after)
+        order = "ASC"
+    elif before is not None:
+        conditions.append("id < %s")
+        cursor_params.append(before)
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    # One extra row tells whether there is another page in that direction
+    cur.execute(
+        f"SELECT {columns} FROM events {where_clause} ORDER BY id {order} LIMIT %s",
+        params + cursor_params + [EVENTS_PER_PAGE + 1],
+    )
+    events = list(cur.fetchall())
+    more = len(events) > EVENTS_PER_PAGE
+    events = events[:EVENTS_PER_PAGE]
+    if after is not None:
+        events.reverse()
+        return events, more, after > 0
+    return events, before is not None, more
+
+
+# Substring filters on free-text columns use these ngram FULLTEXT indexes;
+# MATCH() needs the exact column list of one of them
+FULLTEXT_INDEXES = {
+    "ft_user_email": "user_email",
+    "ft_search": "device_id, user_email, target, snippet",
+}
+NGRAM_TOKEN_SIZE = int(os.getenv("NGRAM_TOKEN_SIZE", "2"))
+
+
+def like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def device_condition(cur, value):
+    """
+    Substring filter on device_id, resolved against the cached device list
+    so the query is an IN (...) lookup on idx_device_id.
+    """
+    needle = value.lower()
+    matches = [d for d in facet_values(cur, "device_id") if needle in d.lower()]
+    if not matches:
+        return "FALSE", []
+    return f"device_id IN ({','.join(['%s'] * len(matches))})", matches
+
+
+def text_condition(columns, value):
+    """
+    Case-insensitive substring filter on one FULLTEXT_INDEXES column list.
+    Uses an ngram phrase search, rechecked with LIKE on the candidate rows
+    only. Values shorter than one ngram can't use the index and fall back
+    to a plain LIKE scan.
+    """
+    names = [c.strip() for c in columns.split(",")]
+    like_any = "(" + " OR ".join(f"{c} LIKE %s" for c in names) + ")"
+    like_params = ["%" + like_escape(value) + "%"] * len(names)
+    phrase = value.replace('"', " ").strip()
+    if len(phrase) < NGRAM_TOKEN_SIZE:
+        return like_any, like_params
+
+    return (
+        f"MATCH({columns}) AGAINST (%s IN BOOLEAN MODE) AND {like_any}",
+        ['"' + phrase + '"'] + like_params,
+    )
+
+
+def page_context(events, page, total_events, has_newer, has_older):
+    """Template variables for the Newer/Older pagination links"""
+    total_pages = max(1, (total_events + EVENTS_PER_PAGE - 1) // EVENTS_PER_PAGE)
+    # The total may be an estimate; never show a page beyond it
+    total_pages = max(total_pages, page)
+    return dict(
+        current_page=page,
+        total_pages=total_pages,
+        has_prev=has_newer,
+        has_next=has_older,
+        prev_page=max(1, page - 1),
+        next_page=page + 1,
+        prev_cursor=events[0]["id"] if events else None,
+        next_cursor=events[-1]["id"] if events else None,
+        total_events=total_events,
+    )
+
+
+def page_request():
+    """(page, before, after) from the query string"""
+    before = request.args.get("before", type=int)
+    after = request.args.get("after", type=int)
+    page = request.args.get("page", 1, type=int) or 1
+    if before is None and after is None:
+        page = 1
+    return max(1, page), before, after
 
 
 # ---------------- JWT HELPERS ----------------
@@ -238,12 +1116,14 @@ def login():
 
         con = get_db()
         cursor = con.cursor()
-        cursor.execute(
-            "SELECT id, password_hash FROM users WHERE email=%s", (username,)
-        )
-        user = cursor.fetchone()
-        cursor.close()
-        con.close()
+        try:
+            cursor.execute(
+                "SELECT id, password_hash FROM users WHERE email=%s", (username,)
+            )
+            user = cursor.fetchone()
+        finally:
+            cursor.close()
+            con.close()
 
         if user and check_password_hash(user["password_hash"], password):
             session["user_id"] = user["id"]
@@ -273,9 +1153,7 @@ def dashboard():
     if "user_id" not in session:
         return redirect(url_for("login"))
 
-    page = int(request.args.get("page", 1))
-    per_page = 10
-    offset = (page - 1) * per_page
+    page, before, after = page_request()
 
     # Get filter parameters
     ai_filter = request.args.get("ai_filter", "").strip()
@@ -283,6 +1161,7 @@ def dashboard():
     device_filter = request.args.get("device_filter", "").strip()
     event_type_filter = request.args.get("event_type_filter", "").strip()
     user_filter = request.args.get("user_filter", "").strip()
+    search = request.args.get("search", "").strip()
 
     con = get_db()
     cur = con.cursor()
@@ -301,86 +1180,89 @@ def dashboard():
             params.append(sklearn_filter)
 
         if device_filter:
-            where_conditions.append("device_id LIKE %s")
-            params.append(f"%{device_filter}%")
+            condition, condition_params = device_condition(cur, device_filter)
+            where_conditions.append(condition)
+            params.extend(condition_params)
 
         if event_type_filter:
             where_conditions.append("event_type = %s")
             params.append(event_type_filter)
 
         if user_filter:
-            where_conditions.append("user_email LIKE %s")
-            params.append(f"%{user_filter}%")
+            condition, condition_params = text_condition("user_email", user_filter)
+            where_conditions.append(condition)
+            params.extend(condition_params)
+
+        if search:
+            condition, condition_params = text_condition(
+                FULLTEXT_INDEXES["ft_search"], search
+            )
+            where_conditions.append(condition)
+            params.extend(condition_params)
 
         where_clause = ""
         if where_conditions:
             where_clause = "WHERE " + " AND ".join(where_conditions)
 
-        # Get total count with filters
-        count_query = f"SELECT COUNT(*) as total FROM events {where_clause}"
-        cur.execute(count_query, params)
-        total_events = cur.fetchone()["total"]
-        total_pages = max(1, (total_events + per_page - 1) // per_page)
+        # Get total count with filters (cached)
+        total_events = count_events(cur, where_clause, params)
 
         # Fetch events with dual classification columns
-        events_query = f"""
-            SELECT id, device_id, user_email, event_type, target, snippet, 
-                   ai_label, ai_confidence, sklearn_label, sklearn_confidence, 
-                   policy_id, created_at
-            FROM events 
-            {where_clause}
-            ORDER BY id DESC 
-            LIMIT %s OFFSET %s
-        """
-        cur.execute(events_query, params + [per_page, offset])
-        events = cur.fetchall()
-
-        # Chart data for AI classification
-        ai_chart_where = where_conditions + ["ai_label IS NOT NULL"]
-        ai_chart_clause = "WHERE " + " AND ".join(ai_chart_where)
-
-        ai_chart_query = f"""
-            SELECT ai_label, COUNT(*) as cnt 
-            FROM events 
-            {ai_chart_clause}
-            GROUP BY ai_label 
-            ORDER BY cnt DESC 
-            LIMIT 10
-        """
-        cur.execute(ai_chart_query, params)
-        ai_stats = cur.fetchall()
-
-        # Chart data for Sklearn classification
-        sklearn_chart_where = where_conditions + ["sklearn_label IS NOT NULL"]
-        sklearn_chart_clause = "WHERE " + " AND ".join(sklearn_chart_where)
-
-        sklearn_chart_query = f"""
-            SELECT sklearn_label, COUNT(*) as cnt 
-            FROM events 
-            {sklearn_chart_clause}
-            GROUP BY sklearn_label 
-            ORDER BY cnt DESC 
-            LIMIT 10
-        """
-        cur.execute(sklearn_chart_query, params)
-        sklearn_stats = cur.fetchall()
-
-        # Get unique values for filter dropdowns
-        cur.execute(
-            "SELECT DISTINCT ai_label FROM events WHERE ai_label IS NOT NULL ORDER BY ai_label"
+        events, has_newer, has_older = fetch_event_page(
+            cur,
+            """id, device_id, user_email, event_type, target, snippet,
+               ai_label, ai_confidence, sklearn_label, sklearn_confidence,
+               final_label, final_confidence, tier, policy_id, created_at""",
+            where_conditions,
+            params,
+            before=before,
+            after=after,
         )
-        ai_labels = [row["ai_label"] for row in cur.fetchall()]
 
-        cur.execute(
-            "SELECT DISTINCT sklearn_label FROM events WHERE sklearn_label IS NOT NULL ORDER BY sklearn_label"
-        )
-        sklearn_labels = [row["sklearn_label"] for row in cur.fetchall()]
-
-        cur.execute("SELECT DISTINCT device_id FROM events ORDER BY device_id")
-        devices = [row["device_id"] for row in cur.fetchall()]
+        if not user_filter and not search:
+            # Chart data from the daily rollup; the other filters are
+            # rollup columns with the same names
+            ai_stats = rollup_label_counts(cur, "ai_label", where_conditions, params)
+            sklearn_stats = rollup_label_counts(
+                cur, "sklearn_label", where_conditions, params
+            )
+        else:
+            # User and text search are not rollup dimensions: aggregate the events
+            # Chart data for AI classification
+            ai_chart_where = where_conditions + ["ai_label IS NOT NULL"]
+            ai_chart_clause = "WHERE " + " AND ".join(ai_chart_where)
+
+            ai_chart_query = f"""
+                SELECT ai_label, COUNT(*) as cnt 
+                FROM events 
+                {ai_chart_clause}
+                GROUP BY ai_label 
+                ORDER BY cnt DESC 
+                LIMIT 10
+            """
+            cur.execute(ai_chart_query, params)
+            ai_stats = cur.fetchall()
+
+            # Chart data for Sklearn classification
+            sklearn_chart_where = where_conditions + ["sklearn_label IS NOT NULL"]
+            sklearn_chart_clause = "WHERE " + " AND ".join(sklearn_chart_where)
+
+            sklearn_chart_query = f"""
+                SELECT sklearn_label, COUNT(*) as cnt 
+                FROM events 
+                {sklearn_chart_clause}
+                GROUP BY sklearn_label 
+                ORDER BY cnt DESC 
+                LIMIT 10
+            """
+            cur.execute(sklearn_chart_query, params)
+            sklearn_stats = cur.fetchall()
 
-        cur.execute("SELECT DISTINCT event_type FROM events ORDER BY event_type")
-        event_types = [row["event_type"] for row in cur.fetchall()]
+        # Get unique values for filter dropdowns (cached)
+        ai_labels = facet_values(cur, "ai_label")
+        sklearn_labels = facet_values(cur, "sklearn_label")
+        devices = facet_values(cur, "device_id")
+        event_types = facet_values(cur, "event_type")
 
         # Prepare chart data
         ai_chart_labels = json.dumps([s["ai_label"] for s in ai_stats])
@@ -392,7 +1274,7 @@ def dashboard():
         app.logger.error(f"Dashboard query error: {e}")
         events = []
         total_events = 0
-        total_pages = 1
+        has_newer = has_older = False
         ai_chart_labels = json.dumps([])
         ai_chart_values = json.dumps([])
         sklearn_chart_labels = json.dumps([])
@@ -414,13 +1296,7 @@ def dashboard():
         ai_chart_values=ai_chart_values,
         sklearn_chart_labels=sklearn_chart_labels,
         sklearn_chart_values=sklearn_chart_values,
-        current_page=page,
-        total_pages=total_pages,
-        has_prev=page > 1,
-        has_next=page < total_pages,
-        prev_page=page - 1 if page > 1 else None,
-        next_page=page + 1 if page < total_pages else None,
-        total_events=total_events,
+        **page_context(events, page, total_events, has_newer, has_older),
         # Filter data
         ai_labels=ai_labels,
         sklearn_labels=sklearn_labels,
@@ -432,13 +1308,21 @@ def dashboard():
         current_device_filter=device_filter,
         current_event_type_filter=event_type_filter,
         current_user_filter=user_filter,
+        current_search=search,
     )
 
 
 # ---------------- ADMIN PAGES ----------------
 @app.route("/api/health", methods=["GET"])
 def api_health():
-    return jsonify({"status": "ok", "timestamp": datetime.now().isoformat()})
+    return jsonify(
+        {
+            "status": "ok",
+            "timestamp": datetime.now().isoformat(),
+            "db_pool": DB_POOL.stats(),
+            "ingest_queue": INGEST_QUEUE.stats() if INGEST_QUEUE else None,
+        }
+    )
 
 
 @app.route("/users")
@@ -447,18 +1331,20 @@ def users_page():
         return redirect(url_for("login"))
     con = get_db()
     cur = con.cursor()
-    cur.execute(
+    try:
+        cur.execute(
+            """
+            SELECT id, email, full_name, role,
+                   DATE_FORMAT(NOW(), '%Y-%m-%d %H:%i:%s') AS last_login
+            FROM users
+            ORDER BY id DESC
+            LIMIT 100
         """
-        SELECT id, email, full_name, role,
-               DATE_FORMAT(NOW(), '%Y-%m-%d %H:%i:%s') AS last_login
-        FROM users
-        ORDER BY id DESC
-        LIMIT 100
-    """
-    )
-    users = cur.fetchall()
-    cur.close()
-    con.close()
+        )
+        users = cur.fetchall()
+    finally:
+        cur.close()
+        con.close()
     return render_template("users.html", users=users)
 
 
@@ -468,21 +1354,23 @@ def devices_page():
         return redirect(url_for("login"))
     con = get_db()
     cur = con.cursor()
-    cur.execute(
+    try:
+        cur.execute(
+            """
+            SELECT id, device_id, owner_email AS owner,
+                   registered_at AS last_seen,
+                   'active' AS status,
+                   device_id AS hostname,
+                   'Unknown OS' AS os
+            FROM devices
+            ORDER BY registered_at DESC
+            LIMIT 100
         """
-        SELECT id, device_id, owner_email AS owner,
-               registered_at AS last_seen,
-               'active' AS status,
-               device_id AS hostname,
-               'Unknown OS' AS os
-        FROM devices
-        ORDER BY registered_at DESC
-        LIMIT 100
-    """
-    )
-    devices = cur.fetchall()
-    cur.close()
-    con.close()
+        )
+        devices = cur.fetchall()
+    finally:
+        cur.close()
+        con.close()
     return render_template("devices.html", devices=devices)
 
 
@@ -492,17 +1380,19 @@ def policies_page():
         return redirect(url_for("login"))
     con = get_db()
     cur = con.cursor()
-    cur.execute(
+    try:
+        cur.execute(
+            """
+            SELECT id, name, description, rules, created_at 
+            FROM policies 
+            ORDER BY created_at DESC
+            LIMIT 100
         """
-        SELECT id, name, description, rules, created_at 
-        FROM policies 
-        ORDER BY created_at DESC
-        LIMIT 100
-    """
-    )
-    policies = cur.fetchall()
-    cur.close()
-    con.close()
+        )
+        policies = cur.fetchall()
+    finally:
+        cur.close()
+        con.close()
     return render_template("policies.html", policies=policies)
 
 
@@ -518,13 +1408,15 @@ def new_policy():
 
         con = get_db()
         cur = con.cursor()
-        cur.execute(
-            "INSERT INTO policies (name, description, rules) VALUES (%s, %s, %s)",
-            (name, description, rules),
-        )
-        con.commit()
-        cur.close()
-        con.close()
+        try:
+            cur.execute(
+                "INSERT INTO policies (name, description, rules) VALUES (%s, %s, %s)",
+                (name, description, rules),
+            )
+            con.commit()
+        finally:
+            cur.close()
+            con.close()
 
         return redirect(url_for("policies_page"))
 
@@ -597,10 +1489,12 @@ def delete_assignment(assignment_id):
         return redirect(url_for("login"))
     con = get_db()
     cur = con.cursor()
-    cur.execute("DELETE FROM policy_assignments WHERE id=%s", (assignment_id,))
-    con.commit()
-    cur.close()
-    con.close()
+    try:
+        cur.execute("DELETE FROM policy_assignments WHERE id=%s", (assignment_id,))
+        con.commit()
+    finally:
+        cur.close()
+        con.close()
     flash("Assignment deleted.", "success")
     return redirect(url_for("assignments_page"))
 
@@ -663,40 +1557,39 @@ def edit_assignment(assignment_id):
 
     con = get_db()
     cur = con.cursor()
+    try:
+        cur.execute("SELECT id, name FROM policies")
+        policies = cur.fetchall()
 
-    cur.execute("SELECT id, name FROM policies")
-    policies = cur.fetchall()
-
-    cur.execute("SELECT * FROM policy_assignments WHERE id = %s", (assignment_id,))
-    assignment = cur.fetchone()
+        cur.execute("SELECT * FROM policy_assignments WHERE id = %s", (assignment_id,))
+        assignment = cur.fetchone()
 
-    if request.method == "POST":
-        policy_id = request.form.get("policy_id")
-        scope = request.form.get("scope")
-        entity = request.form.get("entity")
+        if request.method == "POST":
+            policy_id = request.form.get("policy_id")
+            scope = request.form.get("scope")
+            entity = request.form.get("entity")
 
-        if scope == "User":
-            cur.execute(
-                """
-                UPDATE policy_assignments SET policy_id=%s, user_email=%s, device_id=NULL WHERE id=%s
-            """,
-                (policy_id, entity, assignment_id),
-            )
-        else:
-            cur.execute(
-                """
-                UPDATE policy_assignments SET policy_id=%s, device_id=%s, user_email=NULL WHERE id=%s
-            """,
-                (policy_id, entity, assignment_id),
-            )
+            if scope == "User":
+                cur.execute(
+                    """
+                    UPDATE policy_assignments SET policy_id=%s, user_email=%s, device_id=NULL WHERE id=%s
+                """,
+                    (policy_id, entity, assignment_id),
+                )
+            else:
+                cur.execute(
+                    """
+                    UPDATE policy_assignments SET policy_id=%s, device_id=%s, user_email=NULL WHERE id=%s
+                """,
+                    (policy_id, entity, assignment_id),
+                )
 
-        con.commit()
+            con.commit()
+            return redirect(url_for("assignments_page"))
+    finally:
         cur.close()
         con.close()
-        return redirect(url_for("assignments_page"))
 
-    cur.close()
-    con.close()
     return render_template(
         "edit_assignment.html", assignment=assignment, policies=policies
     )
@@ -958,11 +1851,21 @@ def delete_device(device_id):
 
         # Delete related events first (optional - you might want to keep them)
         cur.execute("DELETE FROM events WHERE device_id = %s", (device["device_id"],))
+        for table, _, _ in ROLLUP_TABLES:
+            cur.execute(f"DELETE FROM {table} WHERE device_id = %s", (device["device_id"],))
+        # The file inventory goes with the events; the new generation makes
+        # the agent reconcile instead of trusting its delta cursor
+        cur.execute("DELETE FROM device_files WHERE device_id = %s", (device["device_id"],))
+        bump_sync_generation(
+            cur, device["device_id"], sync_generation(cur, device["device_id"], lock=True)
+        )
 
         # Delete device
         cur.execute("DELETE FROM devices WHERE id = %s", (device_id,))
 
         con.commit()
+        FACET_CACHE.invalidate("device_id")
+        COUNT_CACHE.invalidate()
         flash("Device deleted successfully!", "success")
 
     except Exception as e:
@@ -1095,9 +1998,7 @@ def events_page():
     if "user_id" not in session:
         return redirect(url_for("login"))
 
-    page = int(request.args.get("page", 1))
-    per_page = 10
-    offset = (page - 1) * per_page
+    page, before, after = page_request()
 
     # Get filter parameters including sklearn
     device_filter = request.args.get("device_filter", "").strip()
@@ -1105,6 +2006,7 @@ def events_page():
     ai_label_filter = request.args.get("ai_label_filter", "").strip()
     sklearn_label_filter = request.args.get("sklearn_label_filter", "").strip()
     user_filter = request.args.get("user_filter", "").strip()
+    search = request.args.get("search", "").strip()
 
     con = get_db()
     cur = con.cursor()
@@ -1115,8 +2017,9 @@ def events_page():
         params = []
 
         if device_filter:
-            where_conditions.append("device_id LIKE %s")
-            params.append(f"%{device_filter}%")
+            condition, condition_params = device_condition(cur, device_filter)
+            where_conditions.append(condition)
+            params.extend(condition_params)
 
         if event_type_filter:
             where_conditions.append("event_type = %s")
@@ -1131,58 +2034,48 @@ def events_page():
             params.append(sklearn_label_filter)
 
         if user_filter:
-            where_conditions.append("user_email LIKE %s")
-            params.append(f"%{user_filter}%")
+            condition, condition_params = text_condition("user_email", user_filter)
+            where_conditions.append(condition)
+            params.extend(condition_params)
+
+        if search:
+            condition, condition_params = text_condition(
+                FULLTEXT_INDEXES["ft_search"], search
+            )
+            where_conditions.append(condition)
+            params.extend(condition_params)
 
         where_clause = ""
         if where_conditions:
             where_clause = "WHERE " + " AND ".join(where_conditions)
 
-        # Get total count with filters
-        count_query = f"SELECT COUNT(*) as total FROM events {where_clause}"
-        cur.execute(count_query, params)
-        total_events = cur.fetchone()["total"]
-        total_pages = max(1, (total_events + per_page - 1) // per_page)
+        # Get total count with filters (cached)
+        total_events = count_events(cur, where_clause, params)
 
         # Fetch events with dual classification
-        events_query = f"""
-            SELECT id, created_at, device_id, user_email,
-                   event_type, target, snippet, detector_hits,
-                   ai_label, ai_confidence, sklearn_label, sklearn_confidence, policy_id
-            FROM events
-            {where_clause}
-            ORDER BY id DESC
-            LIMIT %s OFFSET %s
-        """
-        cur.execute(events_query, params + [per_page, offset])
-        events = cur.fetchall()
-
-        # Get unique values for filter dropdowns
-        cur.execute(
-            "SELECT DISTINCT device_id FROM events WHERE device_id IS NOT NULL ORDER BY device_id"
-        )
-        devices = [row["device_id"] for row in cur.fetchall()]
-
-        cur.execute(
-            "SELECT DISTINCT event_type FROM events WHERE event_type IS NOT NULL ORDER BY event_type"
-        )
-        event_types = [row["event_type"] for row in cur.fetchall()]
-
-        cur.execute(
-            "SELECT DISTINCT ai_label FROM events WHERE ai_label IS NOT NULL ORDER BY ai_label"
+        events, has_newer, has_older = fetch_event_page(
+            cur,
+            """id, created_at, device_id, user_email,
+               event_type, target, snippet, detector_hits,
+               ai_label, ai_confidence, sklearn_label, sklearn_confidence,
+               final_label, final_confidence, tier, policy_id""",
+            where_conditions,
+            params,
+            before=before,
+            after=after,
         )
-        ai_labels = [row["ai_label"] for row in cur.fetchall()]
 
-        cur.execute(
-            "SELECT DISTINCT sklearn_label FROM events WHERE sklearn_label IS NOT NULL ORDER BY sklearn_label"
-        )
-        sklearn_labels = [row["sklearn_label"] for row in cur.fetchall()]
+        # Get unique values for filter dropdowns (cached)
+        devices = facet_values(cur, "device_id")
+        event_types = facet_values(cur, "event_type")
+        ai_labels = facet_values(cur, "ai_label")
+        sklearn_labels = facet_values(cur, "sklearn_label")
 
     except Exception as e:
         app.logger.error(f"Events query error: {e}")
         events = []
         total_events = 0
-        total_pages = 1
+        has_newer = has_older = False
         devices = []
         event_types = []
         ai_labels = []
@@ -1196,13 +2089,7 @@ def events_page():
     return render_template(
         "events.html",
         events=events,
-        current_page=page,
-        total_pages=total_pages,
-        has_prev=page > 1,
-        has_next=page < total_pages,
-        prev_page=page - 1 if page > 1 else None,
-        next_page=page + 1 if page < total_pages else None,
-        total_events=total_events,
+        **page_context(events, page, total_events, has_newer, has_older),
         # Filter data
         devices=devices,
         event_types=event_types,
@@ -1214,6 +2101,7 @@ def events_page():
         current_ai_label_filter=ai_label_filter,
         current_sklearn_label_filter=sklearn_label_filter,
         current_user_filter=user_filter,
+        current_search=search,
     )
 
 
@@ -1243,39 +2131,74 @@ def api_token():
                 (device_id,),
             )
             con.commit()
+    finally:
+        cur.close()
+        con.close()
+
+    # The file inventory is served separately by /api/inventory
+    token = create_jwt(device_id)
+    return jsonify({"token": token, "message": "Device registered"})
+
+
+@app.route("/api/inventory", methods=["GET"])
+@token_required
+def api_inventory(decoded):
+    """
+    One page of the calling device's file inventory, in path_hash order.
+    Pass the returned "next" as ?after= to get the following page.
+    Gzip-compressed when the client accepts it.
+    """
+    device_id = decoded["device_id"]
+    after = request.args.get("after", "")
+    limit = max(1, min(request.args.get("limit", 5000, type=int), 20000))
 
-        # Get existing files for this device
+    con = get_db()
+    cur = con.cursor()
+    try:
         cur.execute(
             """
-            SELECT DISTINCT target 
-            FROM events 
-            WHERE device_id=%s AND event_type='file_scan'
+            SELECT path_hash, path FROM device_files
+            WHERE device_id=%s AND path_hash > %s
+            ORDER BY path_hash
+            LIMIT %s
             """,
-            (device_id,),
+            (device_id, after, limit),
         )
-        existing_files = [row["target"] for row in cur.fetchall()]
-
+        rows = cur.fetchall()
     finally:
         cur.close()
         con.close()
 
-    token = create_jwt(device_id)
-    return jsonify(
+    body = json.dumps(
         {
-            "token": token,
-            "existing_files": existing_files,
-            "message": f"Device registered, found {len(existing_files)} existing files",
+            "files": [row["path"] for row in rows],
+            "next": rows[-1]["path_hash"] if len(rows) == limit else None,
         }
-    )
+    ).encode("utf-8")
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = app.response_class(
+            gzip.compress(body), mimetype="application/json"
+        )
+        response.headers["Content-Encoding"] = "gzip"
+        return response
+    return app.response_class(body, mimetype="application/json")
 
 
 @app.route("/api/sync_files", methods=["POST"])
 @token_required
 def api_sync_files(decoded):
-    """Sync file states - remove deleted files, add new ones"""
+    """
+    Sync file states - remove deleted files, report new ones. Three modes:
+
+    - delta: {"generation", "added", "removed"} since the generation the
+      server last acknowledged; answered with "resync" if it doesn't match.
+    - digest: {"directory_digests"} -> directories whose file list differs.
+    - full: {"current_files"}, optionally limited to {"dirs"}.
+
+    Delta and full syncs return the new generation for the next delta.
+    """
     data = request.get_json(silent=True) or {}
     device_id = data.get("device_id")
-    current_files = data.get("current_files", [])
 
     if not device_id:
         return jsonify({"error": "device_id required"}), 400
@@ -1284,35 +2207,47 @@ def api_sync_files(decoded):
     cur = con.cursor()
 
     try:
-        # Get files currently in database for this device
-        cur.execute(
-            """
-            SELECT DISTINCT target 
-            FROM events 
-            WHERE device_id=%s AND event_type='file_scan'
-            """,
-            (device_id,),
-        )
-        db_files = set(row["target"] for row in cur.fetchall())
-        current_files_set = set(current_files)
+        if "directory_digests" in data:
+            agent_digests = data.get("directory_digests") or {}
+            server_digests = directory_digests(known_device_files(cur, device_id))
+            mismatched = [
+                directory
+                for directory in set(agent_digests) | set(server_digests)
+                if agent_digests.get(directory) != server_digests.get(directory)
+            ]
+            return jsonify(
+                {
+                    "status": "ok",
+                    "mismatched_dirs": mismatched,
+                    "generation": sync_generation(cur, device_id),
+                }
+            )
 
-        # Find files that were deleted and new files
-        deleted_files = db_files - current_files_set
-        new_files = current_files_set - db_files
+        generation = sync_generation(cur, device_id, lock=True)
 
-        # Remove events for deleted files
-        if deleted_files:
-            placeholders = ",".join(["%s"] * len(deleted_files))
-            cur.execute(
-                f"""
-                DELETE FROM events 
-                WHERE device_id=%s AND event_type='file_scan' AND target IN ({placeholders})
-                """,
-                (device_id,) + tuple(deleted_files),
-            )
-            deleted_count = cur.rowcount
+        if "generation" in data:
+            if data["generation"] != generation:
+                con.rollback()
+                return jsonify({"status": "resync", "generation": generation})
+
+            added = set(data.get("added") or [])
+            deleted_files = set(data.get("removed") or []) - added
+            new_files = added - known_device_files(cur, device_id, added)
         else:
-            deleted_count = 0
+            current_files_set = set(data.get("current_files", []))
+            db_files = known_device_files(cur, device_id)
+            if data.get("dirs") is not None:
+                # Scoped full sync of the directories whose digests differ
+                dirs = set(data["dirs"])
+                db_files = {f for f in db_files if path_dir(f) in dirs}
+
+            # Find files that were deleted and new files
+            deleted_files = db_files - current_files_set
+            new_files = current_files_set - db_files
+
+        # Remove events for deleted files
+        deleted_count = delete_device_files(cur, device_id, deleted_files)
+        generation = bump_sync_generation(cur, device_id, generation)
 
         con.commit()
 
@@ -1323,6 +2258,7 @@ def api_sync_files(decoded):
     return jsonify(
         {
             "status": "ok",
+            "generation": generation,
             "deleted_files_count": deleted_count,
             "new_files_to_scan": list(new_files),
             "deleted_files": list(deleted_files),
@@ -1334,80 +2270,24 @@ def api_sync_files(decoded):
 @token_required
 def api_events(decoded):
     data = request.get_json(silent=True) or {}
-    device_id = data.get("device_id")
+    if not isinstance(data, dict) or not data:
+        return jsonify({"error": "Invalid payload"}), 400
+    if INGEST_QUEUE:
+        return enqueue_events([data])
 
     con = get_db()
     cur = con.cursor()
 
     try:
-        # Check if this exact event already exists (prevent duplicates)
-        if data.get("event_type") == "file_scan":
-            cur.execute(
-                """
-                SELECT id FROM events 
-                WHERE device_id=%s AND event_type='file_scan' AND target=%s
-                """,
-                (device_id, data.get("target")),
-            )
-            existing = cur.fetchone()
-            if existing:
-                # Update existing record with dual classification
-                cur.execute(
-                    """
-                    UPDATE events 
-                    SET snippet=%s, detector_hits=%s, ai_label=%s, ai_confidence=%s, 
-                        sklearn_label=%s, sklearn_confidence=%s, policy_id=%s
-                    WHERE id=%s
-                    """,
-                    (
-                        data.get("snippet"),
-                        (
-                            json.dumps(data.get("detector_hits"))
-                            if data.get("detector_hits")
-                            else None
-                        ),
-                        (data.get("ai_classification") or {}).get("label"),
-                        (data.get("ai_classification") or {}).get("confidence"),
-                        (data.get("sklearn_classification") or {}).get("label"),
-                        (data.get("sklearn_classification") or {}).get("confidence"),
-                        data.get("policy_id"),
-                        existing["id"],
-                    ),
-                )
-                con.commit()
-                return jsonify({"status": "updated"})
-
-        # Insert new event with dual classification
-        cur.execute(
-            """
-            INSERT INTO events (device_id, user_email, event_type, target, snippet,
-                                detector_hits, ai_label, ai_confidence, 
-                                sklearn_label, sklearn_confidence, policy_id)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """,
-            (
-                device_id,
-                data.get("user_email"),
-                data.get("event_type"),
-                data.get("target"),
-                data.get("snippet"),
-                (
-                    json.dumps(data.get("detector_hits"))
-                    if data.get("detector_hits")
-                    else None
-                ),
-                (data.get("ai_classification") or {}).get("label"),
-                (data.get("ai_classification") or {}).get("confidence"),
-                (data.get("sklearn_classification") or {}).get("label"),
-                (data.get("sklearn_classification") or {}).get("confidence"),
-                data.get("policy_id"),
-            ),
-        )
+        # file_scan events update the existing record for the same target
+        _, updated_count = write_events(cur, [data])
         con.commit()
     finally:
         cur.close()
         con.close()
 
+    if updated_count:
+        return jsonify({"status": "updated"})
     return jsonify({"status": "ok"})
 
 
@@ -1418,85 +2298,17 @@ def api_report(decoded):
     events = payload.get("events")
     if not isinstance(events, list) or not events:
         return jsonify({"error": "Invalid payload"}), 400
+    if not all(isinstance(ev, dict) for ev in events):
+        return jsonify({"error": "Invalid payload"}), 400
+    if INGEST_QUEUE:
+        return enqueue_events(events)
 
     con = get_db()
     cur = con.cursor()
 
     try:
-        processed_count = 0
-        updated_count = 0
-
-        for ev in events:
-            device_id = ev.get("device_id")
-            event_type = ev.get("event_type")
-            target = ev.get("target")
-
-            # For file_scan events, check for duplicates
-            if event_type == "file_scan" and target:
-                cur.execute(
-                    """
-                    SELECT id FROM events 
-                    WHERE device_id=%s AND event_type='file_scan' AND target=%s
-                    """,
-                    (device_id, target),
-                )
-                existing = cur.fetchone()
-
-                if existing:
-                    # Update existing record with dual classification
-                    cur.execute(
-                        """
-                        UPDATE events 
-                        SET snippet=%s, detector_hits=%s, ai_label=%s, ai_confidence=%s,
-                            sklearn_label=%s, sklearn_confidence=%s, policy_id=%s
-                        WHERE id=%s
-                        """,
-                        (
-                            ev.get("snippet"),
-                            (
-                                json.dumps(ev.get("detector_hits"))
-                                if ev.get("detector_hits")
-                                else None
-                            ),
-                            (ev.get("ai_classification") or {}).get("label"),
-                            (ev.get("ai_classification") or {}).get("confidence"),
-                            (ev.get("sklearn_classification") or {}).get("label"),
-                            (ev.get("sklearn_classification") or {}).get("confidence"),
-                            ev.get("policy_id"),
-                            existing["id"],
-                        ),
-                    )
-                    updated_count += 1
-                    continue
-
-            # Insert new event with dual classification
-            cur.execute(
-                """
-                INSERT INTO events (device_id, user_email, event_type, target, snippet,
-                                    detector_hits, ai_label, ai_confidence,
-                                    sklearn_label, sklearn_confidence, policy_id)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            """,
-                (
-                    device_id,
-                    ev.get("user_email"),
-                    event_type,
-                    target,
-                    ev.get("snippet"),
-                    (
-                        json.dumps(ev.get("detector_hits"))
-                        if ev.get("detector_hits")
-                        else None
-                    ),
-                    (ev.get("ai_classification") or {}).get("label"),
-                    (ev.get("ai_classification") or {}).get("confidence"),
-                    (ev.get("sklearn_classification") or {}).get("label"),
-                    (ev.get("sklearn_classification") or {}).get("confidence"),
-                    ev.get("policy_id"),
-                ),
-            )
-            processed_count += 1
-
+        # One lookup for existing file_scan targets, then multi-row upserts
+        processed_count, updated_count = write_events(cur, events)
         con.commit()
     finally:
         cur.close()
@@ -1529,51 +2341,58 @@ def retrain_model():
 
 @app.route("/api/model_stats", methods=["GET"])
 def model_stats():
-    """Get model performance statistics"""
+    """
+    Get model performance statistics, from the event rollups. Pass
+    ?hours=N to only count events from the last N hours.
+    """
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
+    hours = request.args.get("hours", type=int)
+    if hours:
+        table = "event_rollup_hourly"
+        window = "AND bucket >= DATE_FORMAT(NOW() - INTERVAL %s HOUR, '%%Y-%%m-%%d %%H:00:00')"
+        params = [hours]
+    else:
+        table, window, params = "event_rollup_daily", "", []
+
     con = get_db()
     cur = con.cursor()
 
     try:
-        # Get classification comparison stats
+        # Get classification comparison stats; findings settled by rules or
+        # sklearn carry no AI label (N/A) and are left out
         cur.execute(
-            """
+            f"""
             SELECT 
-                ai_label, sklearn_label, COUNT(*) as count
-            FROM events 
-            WHERE ai_label IS NOT NULL AND sklearn_label IS NOT NULL
+                ai_label, sklearn_label, CAST(SUM(events) AS SIGNED) as count
+            FROM {table}
+            WHERE ai_label NOT IN ('', 'N/A') AND sklearn_label <> '' {window}
             GROUP BY ai_label, sklearn_label
+            HAVING count > 0
             ORDER BY count DESC
-        """
+        """,
+            params,
         )
 
         comparison_data = cur.fetchall()
 
         # Get accuracy metrics (where both models agree)
-        cur.execute(
-            """
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN ai_label = sklearn_label THEN 1 ELSE 0 END) as agreement
-            FROM events 
-            WHERE ai_label IS NOT NULL AND sklearn_label IS NOT NULL
-        """
+        total = sum(row["count"] for row in comparison_data)
+        agreement = sum(
+            row["count"]
+            for row in comparison_data
+            if row["ai_label"] == row["sklearn_label"]
         )
-
-        accuracy_data = cur.fetchone()
         agreement_rate = 0
-        if accuracy_data["total"] > 0:
-            agreement_rate = round(
-                accuracy_data["agreement"] / accuracy_data["total"], 3
-            )
+        if total > 0:
+            agreement_rate = round(agreement / total, 3)
 
         return jsonify(
             {
                 "comparison_data": comparison_data,
                 "agreement_rate": agreement_rate,
-                "total_classified": accuracy_data["total"],
+                "total_classified": total,
             }
         )
 
@@ -1587,30 +2406,17 @@ def model_stats():
 # ---------------- CLEANUP UTILITY ----------------
 @app.route("/api/cleanup", methods=["POST"])
 def cleanup_old_events():
-    """Clean up old events to prevent database bloat"""
+    """Purge events past their retention period now"""
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
     con = get_db()
-    cur = con.cursor()
-
-    cur.execute(
-        """
-        DELETE FROM events 
-        WHERE id NOT IN (
-            SELECT id FROM (
-                SELECT id FROM events 
-                ORDER BY id DESC 
-                LIMIT 1000
-            ) as subquery
-        )
-    """
-    )
-
-    deleted_count = cur.rowcount
-    con.commit()
-    cur.close()
-    con.close()
+    try:
+        deleted_count = purge_expired_events(con)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        con.close()
 
     return jsonify({"status": "ok", "deleted_count": deleted_count})
 
@@ -1618,24 +2424,30 @@ def cleanup_old_events():
 # ---------------- INIT ----------------
 if __name__ == "__main__":
     init_db()
+    if INGEST_QUEUE:
+        INGEST_QUEUE.start()
+    if RETENTION_INTERVAL > 0:
+        threading.Thread(target=run_retention, daemon=True).start()
     try:
         con = get_db()
         cur = con.cursor()
-        cur.execute("SELECT COUNT(*) AS c FROM users")
-        c = cur.fetchone()["c"]
-        if c == 0:
-            cur.execute(
-                "INSERT INTO users (email, full_name, role, password_hash) VALUES (%s,%s,%s,%s)",
-                (
-                    "admin@example.com",
-                    "Administrator",
-                    "admin",
-                    generate_password_hash("admin123"),
-                ),
-            )
-            con.commit()
-        cur.close()
-        con.close()
+        try:
+            cur.execute("SELECT COUNT(*) AS c FROM users")
+            c = cur.fetchone()["c"]
+            if c == 0:
+                cur.execute(
+                    "INSERT INTO users (email, full_name, role, password_hash) VALUES (%s,%s,%s,%s)",
+                    (
+                        "admin@example.com",
+                        "Administrator",
+                        "admin",
+                        generate_password_hash("admin123"),
+                    ),
+                )
+                con.commit()
+        finally:
+            cur.close()
+            con.close()
     except Exception as e:
         app.logger.error(f"Admin seed error: {e}")
 
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import time
+import weakref
+import threading
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """
+    Proxy for a pooled DB-API connection. close() hands the connection back
+    to the pool instead of closing it, so callers keep the usual
+    get_db() ... con.close() pattern. A checked-out proxy that is garbage
+    collected without close() has its connection closed and its slot freed.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._last_used = time.monotonic()
+        self._checked_out = False
+        self._finalizer = None
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._checked_out:
+            self._checked_out = False
+            self._finalizer.detach()
+            self._pool._release(self)
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe connection pool.
+
+    Up to `size` connections are kept open; `max_overflow` more can be opened
+    under load and are closed when returned. Callers wait up to `timeout`
+    seconds when every connection is in use. Idle connections are pinged
+    after `ping_interval` seconds and replaced after `max_lifetime`.
+    """
+
+    def __init__(
+        self,
+        connect,
+        size=10,
+        max_overflow=10,
+        timeout=30,
+        max_lifetime=3600,
+        ping_interval=30,
+    ):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "reclaimed": 0,
+        }
+
+    def _new(self):
+        return PooledConnection(self, self._connect(), time.monotonic())
+
+    def _discard(self, con):
+        self._close_raw(con._raw)
+
+    def _close_raw(self, raw, reclaimed=False):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._stats["closed"] += 1
+            if reclaimed:
+                self._stats["reclaimed"] += 1
+            self._cond.notify()
+
+    def _healthy(self, con):
+        now = time.monotonic()
+        if now - con._created_at > self.max_lifetime:
+            return False
+        if now - con._last_used > self.ping_interval:
+            try:
+                con._raw.ping(reconnect=False)
+            except Exception:
+                return False
+        return True
+
+    def get(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            con = None
+            with self._cond:
+                while not self._idle and self._open >= self.size + self.max_overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout}s"
+                        )
+                    self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+                if self._idle:
+                    con = self._idle.pop()
+                else:
+                    self._open += 1
+
+            if con is None:
+                try:
+                    con = self._new()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats["created"] += 1
+            elif not self._healthy(con):
+                self._discard(con)
+                continue
+
+            con._checked_out = True
+            # Must not reference con, or it would never be collected
+            con._finalizer = weakref.finalize(con, self._close_raw, con._raw, True)
+            return con
+
+    def _release(self, con):
+        try:
+            # Drop any transaction the caller left open
+            con._raw.rollback()
+        except Exception:
+            self._discard(con)
+            return
+        con._last_used = time.monotonic()
+        with self._cond:
+            if len(self._idle) < self.size and self._open <= self.size:
+                self._idle.append(con)
+                self._cond.notify()
+                return
+        # Overflow connection: close it rather than keep it idle
+        self._discard(con)
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                size=self.size,
+                max_overflow=self.max_overflow,
+                open=self._open,
+                idle=len(self._idle),
+                in_use=self._open - len(self._idle),
+            )
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+
+class QueueFull(Exception):
+    pass
+
+
+class IngestQueue:
+    """
+    Durable write-behind queue for agent events, stored in a local SQLite
+    file (WAL mode).
+
+    put() appends events and returns immediately; a background thread hands
+    them to `handler` in batches of up to `batch_size`, or whatever is
+    queued after `flush_interval` seconds. Rows are only deleted once the
+    handler returned, so a crash replays the last batch instead of losing
+    it (delivery is at-least-once). Batches are claimed with a lease, so
+    several server processes can share one queue file.
+
+    If a batch fails, its events are retried one by one. When some of them
+    go through, the ones that fail are counted as bad and moved to
+    ingest_dead after `max_attempts`; when none do (database down), the
+    batch is released and retried later with backoff.
+    """
+
+    def __init__(
+        self,
+        path,
+        handler,
+        batch_size=500,
+        flush_interval=2.0,
+        max_depth=100000,
+        lease_seconds=300,
+        max_attempts=5,
+    ):
+        self.path = path
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_depth = max_depth
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._con().execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingest_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """
+        )
+        self._con().execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingest_dead (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                error TEXT
+            )
+        """
+        )
+
+    def _con(self):
+        # One connection per thread; sqlite3 connections aren't shareable
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def depth(self):
+        return self._con().execute("SELECT COUNT(*) FROM ingest_queue").fetchone()[0]
+
+    def put(self, events):
+        """Queue events durably; raises QueueFull when the backlog is too deep."""
+        self.start()
+        depth = self.depth()
+        if depth + len(events) > self.max_depth:
+            raise QueueFull(f"Ingest queue is full ({depth} events waiting)")
+        now = time.time()
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.executemany(
+                "INSERT INTO ingest_queue (payload, enqueued_at) VALUES (?, ?)",
+                ((json.dumps(ev), now) for ev in events),
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        if depth + len(events) >= self.batch_size:
+            self._wakeup.set()
+        return depth + len(events)
+
+    def start(self):
+        with self._start_lock:
+            if not self._started:
+                self._started = True
+                threading.Thread(target=self._run, daemon=True).start()
+
+    def _claim(self):
+        now = time.time()
+        con = self._con()
+        # Claims are per batch, so the owner/time pair identifies the rows
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute(
+                """
+                UPDATE ingest_queue SET claimed_by=?, claimed_at=?
+                WHERE id IN (
+                    SELECT id FROM ingest_queue
+                    WHERE claimed_at IS NULL OR claimed_at < ?
+                    ORDER BY id LIMIT ?
+                )
+            """,
+                (self.owner, now, now - self.lease_seconds, self.batch_size),
+            )
+            rows = con.execute(
+                "SELECT id, payload FROM ingest_queue "
+                "WHERE claimed_by=? AND claimed_at=? ORDER BY id",
+                (self.owner, now),
+            ).fetchall()
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _execute(self, statements):
+        """Run (sql, rows) pairs with executemany in one transaction."""
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, rows in statements:
+                con.executemany(sql, rows)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+
+    def flush_once(self):
+        """Write one batch; returns the number of events written."""
+        rows = self._claim()
+        if not rows:
+            return 0
+        try:
+            self.handler([json.loads(payload) for _, payload in rows])
+            done, failed = [row_id for row_id, _ in rows], []
+        except Exception as e:
+            logging.warning(f"Ingest batch of {len(rows)} failed ({e}), retrying singly")
+            done, failed = [], []
+            for row_id, payload in rows:
+                try:
+                    self.handler([json.loads(payload)])
+                    done.append(row_id)
+                except Exception as single_error:
+                    failed.append((row_id, str(single_error)))
+
+        statements = [("DELETE FROM ingest_queue WHERE id=?", [(i,) for i in done])]
+        if failed:
+            # Release the claim; only count attempts for events that fail
+            # while others succeed, i.e. the event itself is bad
+            bad = 1 if done else 0
+            statements += [
+                (
+                    "UPDATE ingest_queue SET claimed_by=NULL, claimed_at=NULL, "
+                    "attempts=attempts+? WHERE id=?",
+                    [(bad, row_id) for row_id, _ in failed],
+                ),
+                (
+                    "INSERT INTO ingest_dead (id, payload, enqueued_at, error) "
+                    "SELECT id, payload, enqueued_at, ? FROM ingest_queue "
+                    "WHERE id=? AND attempts>=?",
+                    [(error, row_id, self.max_attempts) for row_id, error in failed],
+                ),
+                (
+                    "DELETE FROM ingest_queue WHERE id=? AND attempts>=?",
+                    [(row_id, self.max_attempts) for row_id, _ in failed],
+                ),
+            ]
+        self._execute(statements)
+        if failed and not done:
+            raise RuntimeError(failed[0][1])
+        return len(done)
+
+    def stats(self):
+        con = self._con()
+        return {
+            "depth": self.depth(),
+            "dead": con.execute("SELECT COUNT(*) FROM ingest_dead").fetchone()[0],
+            "max_depth": self.max_depth,
+        }
+
+    def _run(self):
+        backoff = self.flush_interval
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                # Drain full batches back to back, then wait again
+                while self.flush_once() >= self.batch_size:
+                    pass
+                backoff = self.flush_interval
+            except Exception as e:
+                logging.error(f"Ingest writer error: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache for query results. Entries expire
+    after `ttl` seconds; when `max_entries` is reached the entry closest
+    to expiry is dropped.
+    """
+
+    def __init__(self, ttl, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def peek(self, key):
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            return None
+
+    def get(self, key, compute):
+        """Return the cached value, computing and storing it on a miss."""
+        value = self.peek(key)
+        if value is not None:
+            with self._lock:
+                self._stats["hits"] += 1
+            return value
+        value = compute()
+        with self._lock:
+            self._stats["misses"] += 1
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), ttl=self.ttl)
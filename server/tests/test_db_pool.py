@@ -0,0 +1,157 @@
+import gc
+import threading
+
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.pings = 0
+        self.rollbacks = 0
+        self.broken = False
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.broken:
+            raise ConnectionError("gone")
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.broken:
+            raise ConnectionError("gone")
+
+
+class FakeConnect:
+    def __init__(self):
+        self.made = []
+
+    def __call__(self):
+        self.made.append(FakeConnection())
+        return self.made[-1]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(db_pool, "time", clock)
+    return clock
+
+
+def make_pool(**kwargs):
+    connect = FakeConnect()
+    return ConnectionPool(connect, **kwargs), connect
+
+
+def test_returned_connection_is_reused_after_rollback(clock):
+    pool, connect = make_pool(size=2)
+    con = pool.get()
+    con.close()
+    con.close()  # a second close is a no-op
+
+    assert pool.get()._raw is connect.made[0]
+    assert len(connect.made) == 1
+    assert connect.made[0].rollbacks == 1
+    assert pool.stats()["in_use"] == 1
+
+
+def test_overflow_connection_is_closed_on_return(clock):
+    pool, connect = make_pool(size=1, max_overflow=1)
+    first, second = pool.get(), pool.get()
+    assert pool.stats()["open"] == 2
+
+    second.close()
+    first.close()
+    assert connect.made[1].closed and not connect.made[0].closed
+    assert pool.stats()["open"] == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_get_times_out_when_exhausted():
+    pool, _ = make_pool(size=1, max_overflow=0, timeout=0.05)
+    con = pool.get()
+
+    with pytest.raises(PoolTimeout):
+        pool.get()
+    assert pool.stats()["timeouts"] == 1
+
+    con.close()
+    assert pool.get() is con
+
+
+def test_waiting_get_receives_released_connection():
+    pool, _ = make_pool(size=1, max_overflow=0, timeout=5)
+    con = pool.get()
+    threading.Timer(0.05, con.close).start()
+
+    assert pool.get() is con
+    assert pool.stats()["waits"] >= 1
+
+
+def test_connection_is_replaced_after_max_lifetime(clock):
+    pool, connect = make_pool(max_lifetime=3600, ping_interval=10**6)
+    pool.get().close()
+
+    clock.now += 3601
+    con = pool.get()
+    assert con._raw is connect.made[1]
+    assert connect.made[0].closed
+    assert pool.stats()["open"] == 1
+
+
+def test_idle_connection_is_pinged_on_checkout(clock):
+    pool, connect = make_pool(ping_interval=30)
+    pool.get().close()
+
+    clock.now += 10
+    pool.get().close()
+    assert connect.made[0].pings == 0
+
+    clock.now += 31
+    pool.get().close()
+    assert connect.made[0].pings == 1
+
+    # A connection that fails the ping is dropped for a new one
+    connect.made[0].broken = True
+    clock.now += 31
+    con = pool.get()
+    assert con._raw is connect.made[1]
+    assert connect.made[0].closed
+
+
+def test_connection_failing_rollback_is_discarded(clock):
+    pool, connect = make_pool()
+    con = pool.get()
+    connect.made[0].broken = True
+    con.close()
+
+    assert connect.made[0].closed
+    assert pool.stats()["open"] == 0
+
+
+def test_leaked_connections_are_reclaimed(clock):
+    pool, connect = make_pool(size=2, max_overflow=0, timeout=0.05)
+    for _ in range(10):
+        pool.get()  # never closed
+    gc.collect()
+
+    assert all(raw.closed for raw in connect.made)
+    stats = pool.stats()
+    assert stats["reclaimed"] == 10
+    assert stats["open"] == 0
+    pool.get()
+    pool.get()
@@ -0,0 +1,113 @@
+import pytest
+
+import ingest_queue
+from ingest_queue import IngestQueue, QueueFull
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ingest_queue, "time", clock)
+    return clock
+
+
+def make_queue(path, handler=None, **kwargs):
+    queue = IngestQueue(str(path), handler or (lambda events: None), **kwargs)
+    # The tests drive flush_once() themselves instead of the writer thread
+    queue._started = True
+    return queue
+
+
+def claimed(queue):
+    return [row_id for row_id, _ in queue._claim()]
+
+
+def test_claims_batches_in_order_and_skips_leased_rows(tmp_path, clock):
+    queue = make_queue(tmp_path / "q.db", batch_size=3)
+    queue.put([{"n": n} for n in range(5)])
+
+    assert claimed(queue) == [1, 2, 3]
+    clock.now += 1
+    assert claimed(queue) == [4, 5]
+    clock.now += 1
+    assert claimed(queue) == []
+
+
+def test_expired_lease_is_claimed_again(tmp_path, clock):
+    path = tmp_path / "q.db"
+    first = make_queue(path, lease_seconds=300)
+    second = make_queue(path, lease_seconds=300)
+    first.put([{"n": 1}, {"n": 2}])
+
+    assert claimed(first) == [1, 2]
+    clock.now += 299
+    assert claimed(second) == []
+    clock.now += 2
+    assert claimed(second) == [1, 2]
+
+
+def test_flush_hands_batch_to_handler_and_deletes_it(tmp_path, clock):
+    received = []
+    queue = make_queue(tmp_path / "q.db", received.extend)
+    queue.put([{"n": 1}, {"n": 2}])
+
+    assert queue.flush_once() == 2
+    assert received == [{"n": 1}, {"n": 2}]
+    assert queue.depth() == 0
+    assert queue.flush_once() == 0
+
+
+def test_bad_event_is_dead_lettered_after_max_attempts(tmp_path, clock):
+    def handler(events):
+        if any(ev.get("bad") for ev in events):
+            raise ValueError("bad event")
+
+    queue = make_queue(tmp_path / "q.db", handler, max_attempts=5)
+    queue.put([{"bad": True}])
+    for attempt in range(1, 6):
+        # Good events going through alongside show the event itself is bad
+        queue.put([{"n": attempt}])
+        assert queue.flush_once() == 1
+        clock.now += 1
+
+    assert queue.depth() == 0
+    assert queue.stats()["dead"] == 1
+    error = queue._con().execute("SELECT error FROM ingest_dead").fetchone()[0]
+    assert error == "bad event"
+
+
+def test_failing_handler_releases_batch_without_counting_attempts(tmp_path, clock):
+    def handler(events):
+        raise ConnectionError("database down")
+
+    queue = make_queue(tmp_path / "q.db", handler, max_attempts=2)
+    queue.put([{"n": 1}, {"n": 2}])
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match="database down"):
+            queue.flush_once()
+        clock.now += 1
+
+    assert queue.depth() == 2
+    assert queue.stats()["dead"] == 0
+    attempts = queue._con().execute("SELECT attempts FROM ingest_queue").fetchall()
+    assert attempts == [(0,), (0,)]
+    # Released, so the next flush can claim them right away
+    assert claimed(queue) == [1, 2]
+
+
+def test_put_raises_queue_full_at_capacity(tmp_path, clock):
+    queue = make_queue(tmp_path / "q.db", max_depth=3)
+    assert queue.put([{"n": 1}, {"n": 2}]) == 2
+
+    with pytest.raises(QueueFull):
+        queue.put([{"n": 3}, {"n": 4}])
+    assert queue.depth() == 2
+    assert queue.put([{"n": 3}]) == 3
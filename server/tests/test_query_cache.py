@@ -0,0 +1,59 @@
+import pytest
+
+import query_cache
+from query_cache import TTLCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache, "time", clock)
+    return clock
+
+
+def test_cache_computes_once_until_expiry(clock):
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get("k", compute) == 1
+    clock.now += 59
+    assert cache.get("k", compute) == 1
+    clock.now += 2
+    assert cache.peek("k") is None
+    assert cache.get("k", compute) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_cache_drops_entry_closest_to_expiry_when_full(clock):
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.get("a", lambda: "a")
+    clock.now += 1
+    cache.get("b", lambda: "b")
+    cache.get("c", lambda: "c")
+
+    assert cache.peek("a") is None
+    assert cache.peek("b") == "b" and cache.peek("c") == "c"
+
+
+def test_cache_invalidate(clock):
+    cache = TTLCache(ttl=60)
+    cache.get("a", lambda: "a")
+    cache.get("b", lambda: "b")
+
+    cache.invalidate("a")
+    assert cache.peek("a") is None and cache.peek("b") == "b"
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0